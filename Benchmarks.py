@@ -0,0 +1,234 @@
+import json
+import os
+import platform
+import time
+import numpy as np
+
+import InputData as D
+import MultiCohortClasses as Cls
+import ParameterClasses as P
+from MarkovModelClasses import Cohort, CohortEngines, CompiledMarkovModel, Patient
+from ProbilisticParamClasses import ParameterGenerator
+
+SIM_LENGTH = D.SIM_LENGTH   # simulation length of benchmarks
+N_REPEATS = 3               # number of times each benchmark is repeated (the fastest run is reported)
+N_PATIENTS = 500            # number of patients to simulate for the patients/sec benchmark
+N_COHORTS = 10              # number of cohorts to simulate for the cohorts/sec benchmark
+N_PARAMETER_SETS = 200      # number of parameter sets to draw for the parameter-sets/sec benchmark
+POP_SIZE = 500              # population size of cohorts in benchmarks
+POP_SIZES = [250, 500, 1000, 2000]  # population sizes for the scaling curve over pop_size
+COHORT_COUNTS = [5, 10, 20, 40]     # numbers of cohorts for the scaling curve over cohort count
+WORKER_COUNTS = [1, 2, 4]           # numbers of processes for the scaling curve over worker count
+ENGINES = list(CohortEngines)       # methods to simulate cohorts
+RESULTS_FILE = 'benchmarks.json'    # file to store the results of this run
+BASELINE_FILE = None        # file of a previous run to compare against (None for no comparison)
+TOLERANCE = 0.1             # relative slowdown with respect to the baseline that is reported as a regression
+
+
+def time_it(func, n_repeats=N_REPEATS):
+    """
+    :param func: function (without arguments) to time
+    :param n_repeats: number of times to call the function
+    :return: the shortest wall-clock time (seconds) of calling the function
+    """
+
+    best = np.inf
+    for i in range(n_repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_rate_matrices(therapy, race, n_repeats=N_REPEATS):
+    """
+    :param therapy: selected therapy
+    :param race: race of the patients
+    :param n_repeats: number of repeats
+    :return: transition rate matrices calculated per second (by get_trans_rate_matrix, without caching)
+    """
+
+    prob_matrix = P.get_trans_prob_matrix(trans_matrix=ParameterGenerator(therapy=therapy, race=race).transCounts)
+    n = 100
+    seconds = time_it(lambda: [P.get_trans_rate_matrix(trans_prob_matrix=prob_matrix) for i in range(n)],
+                      n_repeats=n_repeats)
+    return n / seconds
+
+
+def benchmark_parameter_sets(therapy, race, n=N_PARAMETER_SETS, n_repeats=N_REPEATS):
+    """
+    :param therapy: selected therapy
+    :param race: race of the patients
+    :param n: number of parameter sets to draw
+    :param n_repeats: number of repeats
+    :return: parameter sets drawn per second (by get_new_parameters)
+    """
+
+    param_generator = ParameterGenerator(therapy=therapy, race=race)
+    seconds = time_it(lambda: [param_generator.get_new_parameters(rng=np.random.RandomState(seed=i))
+                               for i in range(n)],
+                      n_repeats=n_repeats)
+    return n / seconds
+
+
+def benchmark_patients(therapy, race, n=N_PATIENTS, sim_length=SIM_LENGTH, n_repeats=N_REPEATS):
+    """
+    :param therapy: selected therapy
+    :param race: race of the patients
+    :param n: number of patients to simulate
+    :param sim_length: simulation length
+    :param n_repeats: number of repeats
+    :return: patients simulated per second (by Patient.simulate)
+    """
+
+    params = P.Parameters(therapy=therapy, race=race)
+    model = CompiledMarkovModel(trans_rate_matrix=params.transRateMatrix)
+    seconds = time_it(lambda: [Patient(id=i, parameters=params, model=model).simulate(sim_length)
+                               for i in range(n)],
+                      n_repeats=n_repeats)
+    return n / seconds
+
+
+def benchmark_cohorts(therapy, race, engine, pop_size=POP_SIZE, n=N_COHORTS, sim_length=SIM_LENGTH,
+                      n_repeats=N_REPEATS):
+    """
+    :param therapy: selected therapy
+    :param race: race of the patients
+    :param engine: (CohortEngines) method to simulate cohorts
+    :param pop_size: population size of cohorts
+    :param n: number of cohorts to simulate
+    :param sim_length: simulation length
+    :param n_repeats: number of repeats
+    :return: cohorts simulated per second (by Cohort.simulate)
+    """
+
+    params = P.Parameters(therapy=therapy, race=race)
+    seconds = time_it(lambda: [Cohort(id=i, pop_size=pop_size, parameters=params, engine=engine).simulate(sim_length)
+                               for i in range(n)],
+                      n_repeats=n_repeats)
+    return n / seconds
+
+
+def benchmark_multi_cohort(therapy, race, engine, pop_size=POP_SIZE, n_cohorts=N_COHORTS, n_workers=1,
+                           sim_length=SIM_LENGTH, n_repeats=N_REPEATS):
+    """
+    :param therapy: selected therapy
+    :param race: race of the patients
+    :param engine: (CohortEngines) method to simulate cohorts
+    :param pop_size: population size of cohorts
+    :param n_cohorts: number of cohorts in the multi-cohort
+    :param n_workers: number of processes to simulate cohorts in parallel
+    :param sim_length: simulation length
+    :param n_repeats: number of repeats
+    :return: cohorts simulated per second (by MultiCohort.simulate, including drawing parameter sets)
+    """
+
+    # cached results would make the benchmark meaningless
+    result_cache_dir = D.RESULT_CACHE_DIR
+    D.RESULT_CACHE_DIR = None
+    try:
+        seconds = time_it(lambda: Cls.MultiCohort(ids=range(n_cohorts), pop_size=pop_size, therapy=therapy,
+                                                  race=race, engine=engine).simulate(sim_length=sim_length,
+                                                                                     n_workers=n_workers),
+                          n_repeats=n_repeats)
+    finally:
+        D.RESULT_CACHE_DIR = result_cache_dir
+    return n_cohorts / seconds
+
+
+def run_benchmarks(races=list(P.Races), therapies=list(P.Therapies), engines=ENGINES):
+    """
+    :param races: (list) of races to benchmark
+    :param therapies: (list) of therapies to benchmark
+    :param engines: (list) of methods to simulate cohorts to benchmark
+    :return: (dictionary) with the description of this machine ('info') and the measured rates ('rates'),
+        where the keys of rates are '<benchmark>/<race>/<therapy>[/<engine>]' for each race/therapy and
+        '<scaling curve>/<value>/<engine>' for scaling curves
+    """
+
+    rates = {}
+
+    # rates for each race and therapy
+    for race in races:
+        for therapy in therapies:
+            name = '{}/{}'.format(race.name, therapy.name)
+            print('Benchmarking', name)
+            rates['rate_matrices_per_sec/' + name] = benchmark_rate_matrices(therapy=therapy, race=race)
+            rates['parameter_sets_per_sec/' + name] = benchmark_parameter_sets(therapy=therapy, race=race)
+            rates['patients_per_sec/' + name] = benchmark_patients(therapy=therapy, race=race)
+            for engine in engines:
+                rates['cohorts_per_sec/{}/{}'.format(name, engine.name)] = benchmark_cohorts(
+                    therapy=therapy, race=race, engine=engine)
+                rates['multi_cohort_cohorts_per_sec/{}/{}'.format(name, engine.name)] = benchmark_multi_cohort(
+                    therapy=therapy, race=race, engine=engine)
+
+    # scaling curves (for the first race and therapy)
+    race, therapy = races[0], therapies[0]
+    for engine in engines:
+        print('Benchmarking scaling curves of', engine.name)
+        for pop_size in POP_SIZES:
+            rates['cohorts_per_sec_by_pop_size/{}/{}'.format(pop_size, engine.name)] = benchmark_cohorts(
+                therapy=therapy, race=race, engine=engine, pop_size=pop_size)
+        for n_cohorts in COHORT_COUNTS:
+            rates['cohorts_per_sec_by_n_cohorts/{}/{}'.format(n_cohorts, engine.name)] = benchmark_multi_cohort(
+                therapy=therapy, race=race, engine=engine, n_cohorts=n_cohorts, n_repeats=1)
+        for n_workers in WORKER_COUNTS:
+            rates['cohorts_per_sec_by_n_workers/{}/{}'.format(n_workers, engine.name)] = benchmark_multi_cohort(
+                therapy=therapy, race=race, engine=engine, n_cohorts=max(COHORT_COUNTS), n_workers=n_workers,
+                n_repeats=1)
+
+    return {'info': {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                     'python': platform.python_version(),
+                     'numpy': np.__version__,
+                     'machine': platform.machine(),
+                     'n_cpus': os.cpu_count(),
+                     'sim_length': SIM_LENGTH},
+            'rates': rates}
+
+
+def save_results(results, file_name):
+    """
+    :param results: results returned by run_benchmarks
+    :param file_name: name of the json file to write the results to
+    """
+    with open(file_name, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def compare_with_baseline(results, baseline_file, tolerance=TOLERANCE):
+    """ prints the rates of this run relative to the rates of a baseline run
+    :param results: results returned by run_benchmarks
+    :param baseline_file: name of the json file of a baseline run
+    :param tolerance: relative slowdown that is reported as a regression
+    :return: (list) of the names of benchmarks that are slower than the baseline by more than the tolerance
+    """
+
+    with open(baseline_file) as file:
+        baseline_rates = json.load(file)['rates']
+
+    print('{:<70} {:>12} {:>12} {:>8}'.format('Benchmark', 'Baseline', 'This run', 'Ratio'))
+    regressions = []
+    for name, rate in sorted(results['rates'].items()):
+        if name not in baseline_rates:
+            continue
+        # ratio of the rate of this run to the rate of the baseline run
+        ratio = rate / baseline_rates[name]
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+        print('{:<70} {:>12.1f} {:>12.1f} {:>8.2f}{}'.format(
+            name, baseline_rates[name], rate, ratio, '  (slower)' if ratio < 1 - tolerance else ''))
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    # run all benchmarks
+    benchmarkResults = run_benchmarks()
+
+    # store the results
+    save_results(results=benchmarkResults, file_name=RESULTS_FILE)
+
+    # compare against the baseline
+    if BASELINE_FILE is not None:
+        compare_with_baseline(results=benchmarkResults, baseline_file=BASELINE_FILE)
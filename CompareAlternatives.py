@@ -1,214 +1,45 @@
 import InputData as D
-import MultiCohortClasses as Cls
-import MultiCohortSupport as Support
+import Profiling
 import ProbilisticParamClasses as P
+import ScenarioGrid as Grid
+from MarkovModelClasses import CohortEngines
+from ProbilisticParamClasses import SamplingMethods
 
 N_COHORTS = 200  # number of cohorts
 POP_SIZE = 2000  # population size of each cohort
-
-# # White
-# # create a multi-cohort to simulate without screening
-# multiCohortNo = Cls.MultiCohort(
-#     ids=range(N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.NO,
-#     race=P.Races.White
-# )
-#
-# multiCohortNo.simulate(sim_length=D.SIM_LENGTH)
-#
-# # create a multi-cohort to simulate with biennial screening
-# multiCohortBi = Cls.MultiCohort(
-#     ids=range(N_COHORTS, 2*N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.BI,
-#     race=P.Races.White
-# )
-#
-# multiCohortBi.simulate(sim_length=D.SIM_LENGTH)
-#
-# # print the estimates for the mean survival time and number of invasive cancer and cancer death
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortNo.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.NO,
-#                        race=P.Races.White)
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortBi.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.BI,
-#                        race=P.Races.White)
-#
-# # draw survival curves and histograms
-# Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                             multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # print comparative outcomes
-# Support.print_comparative_outcomes(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                    multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # report the CEA results
-# Support.report_CEA_CBA(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                        multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # Black
-# #create a multi-cohort to simulate without screening
-# multiCohortNo = Cls.MultiCohort(
-#     ids=range(N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.NO,
-#     race=P.Races.Black
-# )
-#
-# multiCohortNo.simulate(sim_length=D.SIM_LENGTH)
-#
-# # create a multi-cohort to simulate with biennial screening
-# multiCohortBi = Cls.MultiCohort(
-#     ids=range(N_COHORTS, 2*N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.BI,
-#     race=P.Races.Black
-# )
-#
-# multiCohortBi.simulate(sim_length=D.SIM_LENGTH)
-#
-# # print the estimates for the mean survival time and number of invasive cancer and cancer death
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortNo.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.NO,
-#                        race=P.Races.Black)
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortBi.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.BI,
-#                        race=P.Races.Black)
-# #
-# # draw survival curves and histograms
-# Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                             multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # print comparative outcomes
-# Support.print_comparative_outcomes(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                    multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # report the CEA results
-# Support.report_CEA_CBA(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                        multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # AIAN
-# # create a multi-cohort to simulate without screening
-# multiCohortNo = Cls.MultiCohort(
-#     ids=range(N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.NO,
-#     race=P.Races.AIAN
-# )
-#
-# multiCohortNo.simulate(sim_length=D.SIM_LENGTH)
-#
-# # create a multi-cohort to simulate with biennial screening
-# multiCohortBi = Cls.MultiCohort(
-#     ids=range(N_COHORTS, 2*N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.BI,
-#     race=P.Races.AIAN
-# )
-#
-# multiCohortBi.simulate(sim_length=D.SIM_LENGTH)
-#
-# # print the estimates for the mean survival time and number of invasive cancer and cancer death
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortNo.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.NO,
-#                        race=P.Races.AIAN)
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortBi.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.BI,
-#                        race=P.Races.AIAN)
-#
-# # draw survival curves and histograms
-# Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                             multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # print comparative outcomes
-# Support.print_comparative_outcomes(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                    multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # report the CEA results
-# Support.report_CEA_CBA(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                        multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-
-# Hispanic
-# create a multi-cohort to simulate without screening
-multiCohortNo = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=POP_SIZE,
-    therapy=P.Therapies.NO,
-    race=P.Races.Hispanic
-)
-
-multiCohortNo.simulate(sim_length=D.SIM_LENGTH)
-
-# create a multi-cohort to simulate with biennial screening
-multiCohortBi = Cls.MultiCohort(
-    ids=range(N_COHORTS, 2*N_COHORTS),
-    pop_size=POP_SIZE,
-    therapy=P.Therapies.BI,
-    race=P.Races.Hispanic
-)
-
-multiCohortBi.simulate(sim_length=D.SIM_LENGTH)
-
-# print the estimates for the mean survival time and mean time to invasive cancer
-Support.print_outcomes(multi_cohort_outcomes=multiCohortNo.multiCohortOutcomes,
-                       therapy_name=P.Therapies.NO,
-                       race=P.Races.Hispanic)
-Support.print_outcomes(multi_cohort_outcomes=multiCohortBi.multiCohortOutcomes,
-                       therapy_name=P.Therapies.BI,
-                       race=P.Races.Hispanic)
-
-# draw survival curves and histograms
-Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-                                            multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-
-# print comparative outcomes
-Support.print_comparative_outcomes(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-                                   multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-
-# report the CEA results
-Support.report_CEA_CBA(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-                       multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-
-
-# # API
-# # create a multi-cohort to simulate without screening
-# multiCohortNo = Cls.MultiCohort(
-#     ids=range(N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.NO,
-#     race=P.Races.API
-# )
-#
-# multiCohortNo.simulate(sim_length=D.SIM_LENGTH)
-#
-# # create a multi-cohort to simulate with biennial screening
-# multiCohortBi = Cls.MultiCohort(
-#     ids=range(N_COHORTS, 2*N_COHORTS),
-#     pop_size=POP_SIZE,
-#     therapy=P.Therapies.BI,
-#     race=P.Races.API
-# )
-#
-# multiCohortBi.simulate(sim_length=D.SIM_LENGTH)
-#
-# # print the estimates for the mean survival time and mean time to invasive cancer
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortNo.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.NO,
-#                        race=P.Races.API)
-# Support.print_outcomes(multi_cohort_outcomes=multiCohortBi.multiCohortOutcomes,
-#                        therapy_name=P.Therapies.BI,
-#                        race=P.Races.API)
-#
-# # draw survival curves and histograms
-# Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                             multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # print comparative outcomes
-# Support.print_comparative_outcomes(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                                    multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
-# # report the CEA results
-# Support.report_CEA_CBA(multi_cohort_outcomes_no=multiCohortNo.multiCohortOutcomes,
-#                        multi_cohort_outcomes_bi=multiCohortBi.multiCohortOutcomes)
-#
+RACES = list(P.Races)   # races to simulate (each with and without biennial screening)
+N_WORKERS = None        # number of processes to simulate cohorts (None to use all available cores)
+ENGINE = CohortEngines.PATIENT  # method to simulate each cohort
+IF_COMMON_RANDOM_NUMBERS = True  # matched cohorts with and without screening use the same random numbers
+SAMPLING = SamplingMethods.RANDOM  # method to draw parameter sets (LATIN_HYPERCUBE or SOBOL need fewer cohorts)
+# (a SOBOL design is balanced only if N_COHORTS is a power of two, such as 256)
+CHECKPOINT_DIR = None   # directory to store the outcomes of simulated cohorts (None to keep them only in memory)
+EVENT_LOG_DIR = None    # directory to store the events of simulated patients (None to not log events)
+IF_PROFILING = False    # set to True to print the time spent in each phase of the run
+IF_PLOT = True          # set to False to report only numbers and CE tables (without loading plotting modules)
+WTPS = range(0, 100001, 10)  # willingness-to-pay values of the tables of net monetary benefits (None for no tables)
+
+if __name__ == '__main__':
+
+    if IF_PROFILING:
+        Profiling.enable()
+
+    # create a grid of race x therapy arms
+    scenarios = Grid.get_scenario_grid(races=RACES,
+                                       therapies=list(P.Therapies),
+                                       n_cohorts=N_COHORTS,
+                                       pop_size=POP_SIZE,
+                                       sim_length=D.SIM_LENGTH,
+                                       if_common_random_numbers=IF_COMMON_RANDOM_NUMBERS)
+
+    # simulate all arms concurrently
+    multiCohorts = Grid.simulate_scenarios(scenarios=scenarios, n_workers=N_WORKERS, engine=ENGINE,
+                                           checkpoint_dir=CHECKPOINT_DIR, sampling=SAMPLING,
+                                           event_log_dir=EVENT_LOG_DIR)
+
+    # print the outcomes of each arm, the comparative outcomes and the CEA and CBA results of each race
+    Grid.report_scenarios(multi_cohorts=multiCohorts, if_plot=IF_PLOT, wtps=WTPS)
+
+    # print the time spent in each phase
+    if IF_PROFILING:
+        Profiling.print_report()
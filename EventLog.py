@@ -0,0 +1,123 @@
+import os
+import numpy as np
+
+# record of an event: the patient enters a health state at a time (packed, 13 bytes per record; patient ids
+# are cohort id * population size + position, which can exceed the range of 32-bit integers)
+EVENT_DTYPE = np.dtype([('patient', '<i8'), ('state', 'i1'), ('time', '<f4')])
+# number of records held in memory before they are written to the file
+CHUNK_SIZE = 2**16
+
+
+class EventLogWriter:
+    """ writes the events of simulated patients to a binary file of fixed-width records (EVENT_DTYPE);
+    records are written in chunks so that the memory used does not grow with the size of the log, and the
+    file is written under a temporary name until it is closed so that an interrupted run does not leave
+    a partial log """
+
+    def __init__(self, file_name, chunk_size=CHUNK_SIZE):
+        """
+        :param file_name: name of the event log file
+        :param chunk_size: number of records held in memory before they are written to the file
+        """
+        self.fileName = file_name
+        self.chunkSize = chunk_size
+        self.nEvents = 0    # number of events written to the file
+
+        directory = os.path.dirname(file_name)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        self._tempFileName = '{}.{}.tmp'.format(file_name, os.getpid())
+        self._file = open(self._tempFileName, 'wb')
+        self._events = []           # events added one at a time that are not written yet
+        self._eventArrays = []      # arrays of events that are not written yet
+        self._nBuffered = 0         # number of events that are not written yet
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # do not leave a partial log
+            self._file.close()
+            os.remove(self._tempFileName)
+        return False
+
+    def add_event(self, patient_id, state, time):
+        """ adds the event of one patient
+        :param patient_id: id of the patient
+        :param state: index of the health state the patient enters
+        :param time: time at which the patient enters the state
+        """
+        self._events.append((patient_id, state, time))
+        self._nBuffered += 1
+        if self._nBuffered >= self.chunkSize:
+            self.flush()
+
+    def add_events(self, patient_ids, states, times):
+        """ adds the events of many patients
+        :param patient_ids: (array) id of the patient of each event
+        :param states: (array) index of the health state entered at each event
+        :param times: (array) time of each event
+        """
+        events = np.empty(len(patient_ids), dtype=EVENT_DTYPE)
+        events['patient'] = patient_ids
+        events['state'] = states
+        events['time'] = times
+        self._eventArrays.append(events)
+        self._nBuffered += len(events)
+        if self._nBuffered >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """ writes the events that are held in memory to the file """
+        if len(self._events) > 0:
+            self._eventArrays.append(np.array(self._events, dtype=EVENT_DTYPE))
+            self._events = []
+        for events in self._eventArrays:
+            events.tofile(self._file)
+            self.nEvents += len(events)
+        self._eventArrays = []
+        self._nBuffered = 0
+
+    def close(self):
+        """ writes the remaining events and moves the file to its final name """
+        self.flush()
+        self._file.close()
+        os.replace(self._tempFileName, self.fileName)
+
+
+def read_event_log(file_name):
+    """
+    :param file_name: name of an event log file written by EventLogWriter
+    :return: (memory-mapped structured array) of events with fields 'patient', 'state' and 'time'
+        (records are read from the file only when they are accessed)
+    """
+
+    # an empty file cannot be memory-mapped
+    if os.path.getsize(file_name) == 0:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    return np.memmap(file_name, dtype=EVENT_DTYPE, mode='r')
+
+
+def get_state_entry_times(events, state, chunk_size=2**22):
+    """
+    :param events: (array) of events returned by read_event_log
+    :param state: (HealthStates) health state
+    :param chunk_size: number of records scanned at once
+    :return: (patient_ids, times) arrays of the patients who entered this state and the times they entered it
+        (in the order of the log; the log is scanned in chunks so that only the matching records are held in memory)
+    """
+
+    patient_ids = []
+    times = []
+    for start in range(0, len(events), chunk_size):
+        chunk = events[start:start + chunk_size]
+        if_state = chunk['state'] == state.value
+        patient_ids.append(np.asarray(chunk['patient'][if_state]))
+        times.append(np.asarray(chunk['time'][if_state]))
+
+    if len(patient_ids) == 0:
+        return np.empty(0, dtype=EVENT_DTYPE['patient']), np.empty(0, dtype=EVENT_DTYPE['time'])
+    return np.concatenate(patient_ids), np.concatenate(times)
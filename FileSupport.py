@@ -0,0 +1,23 @@
+import os
+
+
+def write_file_atomically(file_name, write):
+    """ writes a file under a temporary name first and then renames it, so that other processes never read
+    a partially written file and an interrupted run does not leave one
+    :param file_name: name of the file (its directory is created if needed)
+    :param write: function that writes the content of the file to an open binary file
+    """
+
+    directory = os.path.dirname(file_name)
+    if directory != '':
+        os.makedirs(directory, exist_ok=True)
+
+    temp_file_name = '{}.{}.tmp'.format(file_name, os.getpid())
+    try:
+        with open(temp_file_name, 'wb') as file:
+            write(file)
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_file_name):
+            os.remove(temp_file_name)
+        raise
@@ -1,3 +1,5 @@
+import json
+import os
 from enum import Enum
 import numpy as np
 import SimPy.RandomVariateGenerators as RVGs
@@ -8,6 +10,10 @@ POP_SIZE = 1000     # cohort population size
 SIM_LENGTH = 25   # length of simulation (years)
 ALPHA = 0.05        # significance level for calculating confidence intervals
 DISCOUNT = 0.03     # annual discount rate
+SURVIVAL_CURVE_TIME_STEP = 0.25     # time step of survival curves that are calculated on a time grid (years)
+CACHE_DIR = None    # directory to cache derived transition rate matrices on disk (None to cache only in memory)
+RESULT_CACHE_DIR = None     # directory to cache outcomes of simulated multi-cohorts (None to disable the cache)
+RESULT_CACHE_MAX_SIZE = 500 * 2**20     # maximum total size of the result cache (bytes)
 # annual probability of background mortality (number per year per 100,000 population)
 ANNUAL_PROB_BACKGROUND_MORT = 4386.10/ 100000
 
@@ -23,83 +29,37 @@ class HealthStates(Enum):
     NATUAL_DEATH = 5
 
 
-# transition rate matrix
-
-TRANS_MATRIX_N0_W = [
-    [93751.120,   6248.880,    0,    0,   0],   # Well
-    [0,   1782.045,   4466.835,    0,   0],   # Local
-    [0,   0,   1465.142,   996.538,   0],  # Regional
-    [0,   0,   0,   57.799,   415.601]  # Distant
-    ]
-
-TRANS_MATRIX_BI_W =[
-    [91324.257,   8675.743,    0,    0,   0],   # Well
-    [0,   6026.124,   2649.619,    0,   0],   # Local
-    [0,   0,   1049.870,   410.339,   0],  # Regional
-    [0,   0,   0,   23.800,   171.130]  # Distant
-    ]
-
-
-TRANS_MATRIX_N0_B = [
-    [95434.880,   4565.120,    0,    0,   0],   # Well
-    [0,   1301.873,   3263.247,    0,   0],   # Local
-    [0,   0,   1962.139,   728.021,   0],  # Regional
-    [0,   0,   0,  30.577,   621.583]  # Distant
-    ]
-
-TRANS_MATRIX_BI_B =[
-    [93661.935,   6338.065,    0,    0,   0],   # Well
-    [0,   4402.386,   1935.679,    0,   0],   # Local
-    [0,   0,   1295.965,   299.773,   0],  # Regional
-    [0,   0,   0,  12.590,   255.946]  # Distant
-    ]
-
-
-
-TRANS_MATRIX_N0_AIAN = [
-    [97358.800,   2641.200,    0,    0,   0],   # Well
-    [0,   753.213,   1887.987,    0,   0],   # Local
-    [0,   0,   899.395,   421.205,   0],  # Regional
-    [0,   0,   0,  26.115,   238.005]  # Distant
-    ]
-
-TRANS_MATRIX_BI_AIAN =[
-    [96333.043,   3666.957,    0,    0,   0],   # Well
-    [0,   2547.048,   1119.908,    0,   0],   # Local
-    [0,   0,   609.911,   173.437,   0],  # Regional
-    [0,   0,   0,  10.753,   98.002]  # Distant
-    ]
+def _read_input_data_file(file_name):
+    """
+    :param file_name: name of the json file of the inputs of each race and therapy
+    :return: (races, therapies, trans_counts, annual_state_utilities) where races and therapies are lists of
+        names, trans_counts is an array indexed by (race, therapy, from_state, to_state) and
+        annual_state_utilities is an array indexed by (race, state)
+    """
 
+    with open(file_name) as file:
+        data = json.load(file)
 
+    # the data file should use the order of health states of the model
+    if data['from_states'] != [s.name for s in HealthStates][:4] \
+            or data['to_states'] != [s.name for s in HealthStates][:5]:
+        raise ValueError('Health states in {} do not match HealthStates.'.format(file_name))
 
-TRANS_MATRIX_N0_H = [
-    [96420.240,   3579.760,    0,    0,   0],   # Well
-    [0,   1020.870,   2558.890,    0,   0],   # Local
-    [0,   0,   1404.159,   570.881,   0],  # Regional
-    [0,   0,   0,  37.678,   209.202]  # Distant
-    ]
-
-TRANS_MATRIX_BI_H = [
-    [95029.977,   4970.023,    0,    0,   0],   # Well
-    [0,   3452.151,   1517.872,    0,   0],   # Local
-    [0,   0,   936.477,   235.069,   0],  # Regional
-    [0,   0,   0,  15.515,   86.142]  # Distant
-    ]
+    races = data['races']
+    therapies = data['therapies']
+    trans_counts = np.array([[data['trans_counts'][race][therapy] for therapy in therapies] for race in races],
+                            dtype=float)
+    annual_state_utilities = np.array([data['annual_state_utilities'][race] for race in races], dtype=float)
 
+    return races, therapies, trans_counts, annual_state_utilities
 
-TRANS_MATRIX_N0_API = [
-    [96469.76,   3530.24,    0,    0,   0],   # Well
-    [0,   1985.76,   1544.48,    0,   0],   # Local
-    [0,   0,   1268.68,   275.8,   0],  # Regional
-    [0,   0,   0,  18.754,   257.046]  # Distant
-    ]
 
-TRANS_MATRIX_BI_API = [
-    [95098.729,   4901.271,    0,    0,   0],   # Well
-    [0,   3985.123,   916.148,    0,   0],   # Local
-    [0,   0,   802.584,   113.565,   0],  # Regional
-    [0,   0,   0,  7.722,   105.842]  # Distant
-    ]
+# counts of transitions and annual health utilities of each race (and therapy) are read from a data file:
+# TRANS_COUNTS[race, therapy, from_state, to_state] is the count of transitions between breast cancer states
+# (from WELL, LOCAL, REGIONAL or DISTANT to WELL, LOCAL, REGIONAL, DISTANT or CANCER_DEATH) and
+# ANNUAL_STATE_UTILITIES[race, state] is the annual health utility of WELL, LOCAL, REGIONAL and DISTANT
+RACES, THERAPIES, TRANS_COUNTS, ANNUAL_STATE_UTILITIES = _read_input_data_file(
+    file_name=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'InputData.json'))
 
 
 # annual cost of each health state
@@ -113,42 +73,6 @@ ANNUAL_STATE_COST = [
     ]
 
 
-# annual health utility of each health state
-ANNUAL_STATE_UTILITY_W = [
-    0.731,         # Well
-    0.950,     # Local
-    0.887,     # Regional
-    0.814,      # Distant
-    ]
-
-ANNUAL_STATE_UTILITY_B = [
-    0.814,         # Well
-    0.960,     # Local
-    0.899,     # Regional
-    0.817,      # Distant
-    ]
-
-ANNUAL_STATE_UTILITY_AIAN = [
-    0.738,         # Well
-    0.950,     # Local
-    0.887,     # Regional
-    0.812,      # Distant
-    ]
-
-ANNUAL_STATE_UTILITY_H = [
-    0.676,         # Well
-    0.945,     # Local
-    0.852,     # Regional
-    0.716,      # Distant
-    ]
-
-ANNUAL_STATE_UTILITY_API = [
-    0.738,         # Well
-    0.950,     # Local
-    0.887,     # Regional
-    0.812,      # Distant
-    ]
-
 # annual screening costs
 NO_COST = 0
 BI_COST = 151.19/2
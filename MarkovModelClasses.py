@@ -1,37 +1,106 @@
+from bisect import bisect_right
+from enum import Enum
 import numpy as np
-import SimPy.EconEval as Econ
-import SimPy.Markov as Markov
-import SimPy.SamplePath as Path
+from scipy.linalg import expm
+import EventLog
+import InputData as Data
+import Profiling
 import SimPy.Statistics as Stat
 from InputData import HealthStates
 
 
+class CohortEngines(Enum):
+    """ methods to simulate a cohort """
+    PATIENT = 0     # simulate patients one at a time (Patient, PatientStateMonitor)
+    VECTORIZED = 1  # simulate all patients of the cohort together on NumPy arrays
+    ANALYTIC = 2    # calculate expected outcomes from the Kolmogorov forward equations (no sampling)
+    # propagate the state occupancy through annual transition probability matrices (no sampling); a patient
+    # makes at most one transition per annual cycle, so outcomes are not comparable with those of the
+    # continuous-time engines above (on the base case, the discounted cost is about 50% higher and the
+    # survival time of patients who die is 0.7 to 1.2 years longer than with ANALYTIC)
+    TRACE = 3
+    TRACE_HALF_CYCLE = 4    # annual cohort trace with half-cycle correction (not comparable either)
+
+
+class CompiledMarkovModel:
+    """ jump tables of the continuous-time Markov model precomputed from the transition rate matrix;
+    it is built once for a parameter set and is shared by all patients of a cohort """
+
+    def __init__(self, trans_rate_matrix):
+        """
+        :param trans_rate_matrix: transition rate matrix (diagonal elements are ignored)
+        """
+
+        # sum of rates out of each state and probabilities of the next state
+        self.exitRates, self.jumpProbs = _get_exit_rates_and_jump_probs(trans_rate_matrix)
+        # cumulative probabilities of the next state
+        self.cumJumpProbs = _get_cumulative_jump_probs(self.jumpProbs)
+
+        # mean sojourn time and cumulative jump probabilities of each state as lists
+        # for fast access when patients are simulated one at a time (None for absorbing states)
+        self._meanSojournTimes = [1 / rate if rate > 0 else None for rate in self.exitRates]
+        self._cumJumpProbs = self.cumJumpProbs.tolist()
+
+    def get_generator(self):
+        """
+        :return: (array) generator matrix of the continuous-time Markov model
+        """
+        return self.jumpProbs * self.exitRates[:, None] - np.diag(self.exitRates)
+
+    def get_next_state(self, current_state_index, rng):
+        """
+        :param current_state_index: index of the current state
+        :param rng: random number generator
+        :return: (dt, i) where dt is the time until next event and i is the index of the next state;
+            dt is None if the current state is absorbing
+        """
+
+        mean_sojourn_time = self._meanSojournTimes[current_state_index]
+        if mean_sojourn_time is None:
+            return None, current_state_index
+
+        dt = rng.exponential(scale=mean_sojourn_time)
+        i = bisect_right(self._cumJumpProbs[current_state_index], rng.random_sample())
+        return dt, i
+
+
 class Patient:
-    def __init__(self, id, parameters):
+    def __init__(self, id, parameters, model=None, event_log=None):
         """ initiates a patient
         :param id: ID of the patient
         :param parameters: an instance of the parameters class
+        :param model: (CompiledMarkovModel) jump tables shared by the patients of a cohort
+            (if not provided, they are built from the transition rate matrix of the parameters)
+        :param event_log: (EventLogWriter) if provided, the initial health state and every change of
+            health state of this patient are written to this event log
         """
         self.id = id
         self.params = parameters
+        self.eventLog = event_log
+        if model is None:
+            model = CompiledMarkovModel(trans_rate_matrix=parameters.transRateMatrix)
+        self.model = model
         self.stateMonitor = PatientStateMonitor(parameters=parameters)  # patient state monitor
 
+    @Profiling.profiled('Gillespie loop')
     def simulate(self, sim_length):
         """ simulate the patient over the specified simulation length """
 
         # random number generator for this patient
         rng = np.random.RandomState(seed=self.id)
-        # gillespie algorithm
-        gillespie = Markov.Gillespie(transition_rate_matrix=self.params.transRateMatrix)
 
         t = 0  # simulation time
         if_stop = False
 
+        # log the initial health state
+        if self.eventLog is not None:
+            self.eventLog.add_event(self.id, self.stateMonitor.currentState.value, t)
+
         while not if_stop:
             # find time until next event (dt), and next state
             # (note that the gillespie algorithm returns None for dt if the process
             # is in an absorbing state)
-            dt, new_state_index = gillespie.get_next_state(
+            dt, new_state_index = self.model.get_next_state(
                 current_state_index=self.stateMonitor.currentState.value,
                 rng=rng)
 
@@ -50,6 +119,9 @@ class Patient:
                 else:
                     # advance time to the time of next event
                     t += dt
+                    # log the change of health state
+                    if self.eventLog is not None:
+                        self.eventLog.add_event(self.id, new_state_index, t)
                 # update health state
                 self.stateMonitor.update(time=t, new_state=HealthStates(new_state_index))
 
@@ -97,6 +169,7 @@ class PatientCostUtilityMonitor:
     def __init__(self, parameters):
 
         self.tLastRecorded = 0  # time when the last cost and outcomes got recorded
+        self.discountFactorLastRecorded = 1  # discount factor at the time of the last recording
 
         # model parameters for this patient
         self.params = parameters
@@ -105,6 +178,7 @@ class PatientCostUtilityMonitor:
         self.totalDiscountedCost = 0
         self.totalDiscountedUtility = 0
 
+    @Profiling.profiled('cost and utility updates')
     def update(self, time, current_state):
         """ updates the discounted total cost and health utility
         :param time: simulation time
@@ -116,12 +190,13 @@ class PatientCostUtilityMonitor:
         utility = self.params.annualStateUtilities[current_state.value]
 
         # discounted cost and utility (continuously compounded)
-        discounted_cost = Econ.pv_continuous_payment(payment=cost,
-                                                     discount_rate=self.params.discountRate,
-                                                     discount_period=(self.tLastRecorded, time))
-        discounted_utility = Econ.pv_continuous_payment(payment=utility,
-                                                        discount_rate=self.params.discountRate,
-                                                        discount_period=(self.tLastRecorded, time))
+        discounted_cost, discounted_utility, self.discountFactorLastRecorded = get_discounted_cost_and_utility(
+            cost=cost,
+            utility=utility,
+            discount_rate=self.params.discountRate,
+            t0=self.tLastRecorded,
+            t1=time,
+            discount_factor_t0=self.discountFactorLastRecorded)
 
         # update total discounted cost and utility
         self.totalDiscountedCost += discounted_cost
@@ -132,44 +207,361 @@ class PatientCostUtilityMonitor:
 
 
 class Cohort:
-    def __init__(self, id, pop_size, parameters):
+    def __init__(self, id, pop_size, parameters, engine=CohortEngines.PATIENT, if_streaming=False,
+                 event_log_file=None):
         """ create a cohort of patients
         :param id: cohort ID
         :param pop_size: population size of this cohort
         :param parameters: parameters
+        :param engine: (CohortEngines) method to simulate this cohort
+        :param if_streaming: set to True to summarize patient outcomes as patients finish
+            (constant memory) instead of storing the outcomes of every patient
+        :param event_log_file: if provided, the initial health state and every change of health state of
+            each patient are written to this file (see EventLog; only for engines that simulate patients)
         """
         self.id = id
         self.popSize = pop_size
         self.params = parameters
-        self.cohortOutcomes = CohortOutcomes()  # outcomes of the simulated cohort
+        self.engine = engine
+        self.eventLogFile = event_log_file
+        self.cohortOutcomes = CohortOutcomes(if_streaming=if_streaming)  # outcomes of the simulated cohort
+
+        if event_log_file is not None and engine not in (CohortEngines.PATIENT, CohortEngines.VECTORIZED):
+            raise ValueError('Events can only be logged when patients are simulated '
+                             '(engine {} does not simulate patients).'.format(engine.name))
 
     def simulate(self, sim_length):
         """ simulate the cohort of patients over the specified number of time-steps
         :param sim_length: simulation length
         """
 
+        # time points of the survival curve
+        self.cohortOutcomes.set_survival_curve_times(times=get_survival_curve_times(sim_length=sim_length))
+
+        if self.engine == CohortEngines.ANALYTIC:
+            # expected outcomes are calculated directly and no patient is simulated
+            self.__calculate_expected_outcomes(sim_length=sim_length)
+            return
+
+        if self.engine in (CohortEngines.TRACE, CohortEngines.TRACE_HALF_CYCLE):
+            # expected outcomes are calculated from the annual cohort trace
+            self.__calculate_trace_outcomes(
+                sim_length=sim_length,
+                if_half_cycle_correction=(self.engine == CohortEngines.TRACE_HALF_CYCLE))
+            return
+
+        # simulate patients (and write their events to the event log if requested)
+        if self.eventLogFile is None:
+            self.__simulate_patients_with_engine(sim_length=sim_length, event_log=None)
+        else:
+            with EventLog.EventLogWriter(file_name=self.eventLogFile) as event_log:
+                self.__simulate_patients_with_engine(sim_length=sim_length, event_log=event_log)
+
+        # calculate cohort outcomes
+        self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
+
+    def __simulate_patients_with_engine(self, sim_length, event_log):
+        """ simulate the patients of this cohort with the engine of this cohort
+        :param sim_length: simulation length
+        :param event_log: (EventLogWriter) event log of the patients (None to not log events)
+        """
+        if self.engine == CohortEngines.VECTORIZED:
+            self.__simulate_vectorized(sim_length=sim_length, event_log=event_log)
+        else:
+            self.__simulate_patients(sim_length=sim_length, event_log=event_log)
+
+    def __simulate_patients(self, sim_length, event_log=None):
+        """ simulate the patients of this cohort one at a time
+        :param sim_length: simulation length
+        :param event_log: (EventLogWriter) event log of the patients (None to not log events)
+        """
+
+        # jump tables shared by all patients
+        model = CompiledMarkovModel(trans_rate_matrix=self.params.transRateMatrix)
+
         # populate and simulate the cohort
         for i in range(self.popSize):
             # create a new patient (use id * pop_size + n as patient id)
             patient = Patient(id=self.id * self.popSize + i,
-                              parameters=self.params)
+                              parameters=self.params,
+                              model=model,
+                              event_log=event_log)
             # simulate
             patient.simulate(sim_length)
 
             # store outputs of this simulation
             self.cohortOutcomes.extract_outcome(simulated_patient=patient)
 
-        # calculate cohort outcomes
+    @Profiling.profiled('expected outcomes')
+    def __calculate_expected_outcomes(self, sim_length):
+        """ calculates the expected outcomes of a patient of this cohort by solving the Kolmogorov
+        forward equations of the continuous-time Markov model over the simulation length
+        :param sim_length: simulation length
+        """
+
+        # transition rates and the generator matrix
+        model = CompiledMarkovModel(trans_rate_matrix=self.params.transRateMatrix)
+        exit_rates = model.exitRates
+        rates = model.jumpProbs * exit_rates[:, None]
+        generator = model.get_generator()
+        n_states = len(exit_rates)
+
+        # cost and utility (per unit of time) of each state
+        cost_rates, utility_rates = _get_cost_and_utility_rates(self.params, exit_rates)
+
+        # initial state distribution
+        p0 = np.zeros(n_states)
+        p0[self.params.initialHealthState.value] = 1
+
+        # expected (discounted) time spent in each state over (0, sim_length)
+        discounted_occupancy = p0 @ _get_integral_of_expm(
+            matrix=generator - self.params.discountRate * np.eye(n_states), t=sim_length)
+        occupancy = p0 @ _get_integral_of_expm(matrix=generator, t=sim_length)
+
+        # states in which the patient is alive
+        alive = np.ones(n_states, dtype=bool)
+        alive[[HealthStates.CANCER_DEATH.value, HealthStates.NATUAL_DEATH.value]] = False
+
+        # survival curve
+        times = self.cohortOutcomes.survivalCurveTimes
+        prob_alive = _get_occupancy_probs(p0=p0, generator=generator, times=times)[:, alive].sum(axis=1)
+
+        # expected survival time of patients who die before the end of the simulation
+        # (E[T | T <= sim_length] = sim_length - (sim_length - E[time alive]) / P(T <= sim_length))
+        prob_dead = 1 - prob_alive[-1]
+        if prob_dead > 0:
+            mean_survival_time = sim_length - (sim_length - occupancy[alive].sum()) / prob_dead
+        else:
+            mean_survival_time = np.nan
+
+        self.cohortOutcomes.set_expected_outcomes(
+            pop_size=self.popSize,
+            mean_survival_time=mean_survival_time,
+            mean_cost=discounted_occupancy @ cost_rates,
+            mean_utility=discounted_occupancy @ utility_rates,
+            # expected number of transitions into each state from a different state
+            mean_n_cancer=occupancy @ rates[:, HealthStates.LOCAL.value],
+            mean_n_cancer_death=occupancy @ rates[:, HealthStates.CANCER_DEATH.value],
+            n_living_patients=self.popSize * prob_alive)
+
+    @Profiling.profiled('cohort trace')
+    def __calculate_trace_outcomes(self, sim_length, if_half_cycle_correction):
+        """ calculates the expected outcomes of a patient of this cohort by propagating the state
+        occupancy through the annual transition probability matrix (a discrete-time Markov cohort trace);
+        since a patient makes at most one transition per cycle, these outcomes differ from those of the
+        continuous-time engines (PATIENT, VECTORIZED and ANALYTIC) and should not be compared with them
+        :param sim_length: simulation length (a whole number of years)
+        :param if_half_cycle_correction: set to True to assume that transitions occur in the middle of
+            each cycle (otherwise the state occupancy at the start of each cycle is used for the whole cycle
+            and deaths are counted at the end of the cycle)
+        """
+
+        n_cycles = int(round(sim_length))
+        if n_cycles != sim_length:
+            raise ValueError('The cohort trace requires a simulation length of a whole number of years.')
+
+        # annual transition probabilities
+        trans_probs = np.array(self.params.transProbMatrix)
+        n_states = len(trans_probs)
+
+        # cost and utility (per unit of time) of each state
+        # (no cost or utility is accrued in states that cannot be left)
+        cost_rates, utility_rates = _get_cost_and_utility_rates(self.params, 1 - np.diag(trans_probs))
+
+        # state occupancy at the start of each cycle and at the end of the last cycle
+        occupancy = np.zeros((n_cycles + 1, n_states))
+        occupancy[0, self.params.initialHealthState.value] = 1
+        for k in range(n_cycles):
+            occupancy[k + 1] = occupancy[k] @ trans_probs
+
+        # state occupancy used for each cycle
+        if if_half_cycle_correction:
+            cycle_occupancy = (occupancy[:-1] + occupancy[1:]) / 2
+        else:
+            cycle_occupancy = occupancy[:-1]
+
+        # present value of continuous payments of 1 per unit of time over each cycle
+        cycle_starts = np.arange(n_cycles)
+        discounted_lengths = get_discounted_cost_and_utility(
+            cost=1, utility=1, discount_rate=self.params.discountRate,
+            t0=cycle_starts, t1=cycle_starts + 1)[0]
+
+        # states in which the patient is alive
+        alive = np.ones(n_states, dtype=bool)
+        alive[[HealthStates.CANCER_DEATH.value, HealthStates.NATUAL_DEATH.value]] = False
+        prob_alive = occupancy[:, alive].sum(axis=1)
+
+        # expected survival time of patients who die before the end of the simulation
+        # (deaths occur at the end of each cycle, or in the middle with half-cycle correction)
+        deaths = prob_alive[:-1] - prob_alive[1:]
+        death_times = cycle_starts + (0.5 if if_half_cycle_correction else 1)
+        if deaths.sum() > 0:
+            mean_survival_time = deaths @ death_times / deaths.sum()
+        else:
+            mean_survival_time = np.nan
+
+        # expected number of transitions into each state from a different state
+        into_state = occupancy[:-1].sum(axis=0)[:, None] * (trans_probs - np.diag(np.diag(trans_probs)))
+
+        self.cohortOutcomes.set_expected_outcomes(
+            pop_size=self.popSize,
+            mean_survival_time=mean_survival_time,
+            mean_cost=discounted_lengths @ cycle_occupancy @ cost_rates,
+            mean_utility=discounted_lengths @ cycle_occupancy @ utility_rates,
+            mean_n_cancer=into_state[:, HealthStates.LOCAL.value].sum(),
+            mean_n_cancer_death=into_state[:, HealthStates.CANCER_DEATH.value].sum(),
+            # survival curve (interpolated between the ends of cycles)
+            n_living_patients=self.popSize * np.interp(self.cohortOutcomes.survivalCurveTimes,
+                                                       np.arange(n_cycles + 1), prob_alive))
+
+    @Profiling.profiled('vectorized event loop')
+    def __simulate_vectorized(self, sim_length, event_log=None):
+        """ simulate all patients of this cohort together; the current state, clock, and accumulated
+        discounted cost and utility of every patient are stored in arrays and all living patients
+        are advanced by one event at each iteration
+        :param sim_length: simulation length
+        :param event_log: (EventLogWriter) event log of the patients (None to not log events)
+        """
+
+        # random number generator for this cohort
+        rng = np.random.RandomState(seed=self.id)
+
+        # rates out of each state and the cumulative probabilities of the next state
+        model = CompiledMarkovModel(trans_rate_matrix=self.params.transRateMatrix)
+
+        # cost and utility (per unit of time) of each state (no cost or utility is accrued after death)
+        cost_rates, utility_rates = _get_cost_and_utility_rates(self.params, model.exitRates)
+
+        # simulate (all patients share the same parameters)
+        survival_times, costs, utilities, n_cancer, n_cancer_death = _simulate_batch(
+            rng=rng,
+            groups=np.zeros(self.popSize, dtype=int),
+            initial_states=np.full(self.popSize, self.params.initialHealthState.value),
+            exit_rates=model.exitRates[None, :],
+            cum_jump_probs=model.cumJumpProbs[None, :, :],
+            cost_rates=cost_rates[None, :],
+            utility_rates=utility_rates[None, :],
+            discount_rate=self.params.discountRate,
+            sim_length=sim_length,
+            patient_ids=self.id * self.popSize + np.arange(self.popSize),
+            event_log=event_log)
+
+        # store outputs of this simulation
+        self.cohortOutcomes.extract_outcomes(
+            survival_times=survival_times[~np.isnan(survival_times)],
+            costs=costs,
+            utilities=utilities,
+            n_cancer=n_cancer,
+            n_cancer_death=n_cancer_death)
+
+
+class MixedCohort(Cohort):
+    """ a cohort of patients of different races; the race of each patient is drawn from the population
+    shares of races and all patients are simulated together on NumPy arrays, with the transition rates,
+    costs and utilities of each patient looked up from the parameters of the patient's race """
+
+    def __init__(self, id, pop_size, parameters, race_shares, if_streaming=False, event_log_file=None):
+        """
+        :param id: cohort ID
+        :param pop_size: population size of this cohort
+        :param parameters: (dictionary) of the parameters of each race (with the same therapy and discount rate)
+        :param race_shares: (dictionary) of the share of each race in the population
+            (shares are normalized to sum to 1)
+        :param if_streaming: set to True to summarize patient outcomes in constant memory
+        :param event_log_file: if provided, the events of each patient are written to this file (see EventLog)
+        """
+        Cohort.__init__(self, id=id, pop_size=pop_size, parameters=parameters,
+                        engine=CohortEngines.VECTORIZED, if_streaming=if_streaming, event_log_file=event_log_file)
+        self.races = list(race_shares)  # races of the population
+        self.raceShares = np.array([race_shares[race] for race in self.races], dtype=float)
+        self.raceShares /= self.raceShares.sum()
+        self.racePopSizes = {}  # number of patients of each race
+        # outcomes of the patients of each race (cohortOutcomes holds the outcomes of all patients)
+        self.raceOutcomes = {race: CohortOutcomes(if_streaming=if_streaming) for race in self.races}
+
+        if len(set(parameters[race].discountRate for race in self.races)) > 1:
+            raise ValueError('Parameters of all races should have the same discount rate.')
+
+    @Profiling.profiled('vectorized event loop')
+    def simulate(self, sim_length):
+        """ simulate the patients of all races together over the specified simulation length
+        :param sim_length: simulation length
+        """
+
+        # time points of the survival curves
+        times = get_survival_curve_times(sim_length=sim_length)
+        self.cohortOutcomes.set_survival_curve_times(times=times)
+        for race in self.races:
+            self.raceOutcomes[race].set_survival_curve_times(times=times)
+
+        # race of each patient (drawn from a separate random number stream so that patient events use
+        # the same random numbers as in a cohort of a single race with the same id)
+        groups = np.random.RandomState(seed=[self.id, 1]).choice(len(self.races), size=self.popSize,
+                                                                  p=self.raceShares)
+
+        # jump tables, costs and utilities of each race
+        models = [CompiledMarkovModel(trans_rate_matrix=self.params[race].transRateMatrix) for race in self.races]
+        rates = [_get_cost_and_utility_rates(self.params[race], model.exitRates)
+                 for race, model in zip(self.races, models)]
+
+        # simulate all patients together
+        batch = dict(rng=np.random.RandomState(seed=self.id),
+                     groups=groups,
+                     initial_states=np.array([self.params[race].initialHealthState.value
+                                              for race in self.races])[groups],
+                     exit_rates=np.array([model.exitRates for model in models]),
+                     cum_jump_probs=np.array([model.cumJumpProbs for model in models]),
+                     cost_rates=np.array([r[0] for r in rates]),
+                     utility_rates=np.array([r[1] for r in rates]),
+                     discount_rate=self.params[self.races[0]].discountRate,
+                     sim_length=sim_length,
+                     patient_ids=self.id * self.popSize + np.arange(self.popSize))
+        if self.eventLogFile is None:
+            survival_times, costs, utilities, n_cancer, n_cancer_death = _simulate_batch(**batch)
+        else:
+            with EventLog.EventLogWriter(file_name=self.eventLogFile) as event_log:
+                survival_times, costs, utilities, n_cancer, n_cancer_death = _simulate_batch(
+                    event_log=event_log, **batch)
+
+        # outcomes of all patients
+        self.cohortOutcomes.extract_outcomes(
+            survival_times=survival_times[~np.isnan(survival_times)],
+            costs=costs,
+            utilities=utilities,
+            n_cancer=n_cancer,
+            n_cancer_death=n_cancer_death)
         self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
 
+        # outcomes of the patients of each race (races without patients have no outcomes)
+        for g, race in enumerate(self.races):
+            in_race = groups == g
+            self.racePopSizes[race] = int(in_race.sum())
+            if self.racePopSizes[race] == 0:
+                continue
+            self.raceOutcomes[race].extract_outcomes(
+                survival_times=survival_times[in_race & ~np.isnan(survival_times)],
+                costs=costs[in_race],
+                utilities=utilities[in_race],
+                n_cancer=n_cancer[in_race],
+                n_cancer_death=n_cancer_death[in_race])
+            self.raceOutcomes[race].calculate_cohort_outcomes(initial_pop_size=self.racePopSizes[race])
+
 
 class CohortOutcomes:
-    def __init__(self):
+    def __init__(self, if_streaming=False):
+        """
+        :param if_streaming: set to True to update the summary statistics as patients finish instead of
+            storing the outcomes of every patient (survivalTimes, costs, utilities, nCancer and nCancerDeath
+            remain empty and the survival curve is not available)
+        """
 
+        self.ifStreaming = if_streaming
         self.survivalTimes = []         # patients' survival times
         self.costs = []                 # patients' discounted costs
         self.utilities =[]              # patients' discounted utilities
-        self.nLivingPatients = None     # survival curve (sample path of number of alive patients over time)
+        self.survivalCurveTimes = None  # time points of the survival curve
+        self.nLivingPatients = None     # survival curve (number of alive patients at the time points)
+        self._nDeaths = None            # number of deaths since the previous time point (while streaming)
         self.nCancer =[]        # number of the diagnosis of invasive cancer
         self.nCancerDeath = []   # number of cancer death
 
@@ -179,10 +571,36 @@ class CohortOutcomes:
         self.statCost = None            # summary statistics for discounted cost
         self.statUtility = None         # summary statistics for discounted utility
 
+        if self.ifStreaming:
+            self.statSurvivalTime = StreamingStat(name='Survival time')
+            self.statNCancer = StreamingStat(name='Number of invasive cancer')
+            self.statNCancerDeath = StreamingStat(name='Number of cancer death')
+            self.statCost = StreamingStat(name='Discounted cost')
+            self.statUtility = StreamingStat(name='Discounted utility')
+
+    def set_survival_curve_times(self, times):
+        """
+        :param times: (array) time points (starting at 0) at which the survival curve is calculated
+        """
+        self.survivalCurveTimes = times
+        self._nDeaths = np.zeros(len(times), dtype=int)
+
     def extract_outcome(self, simulated_patient):
         """ extracts outcomes of a simulated patient
         :param simulated_patient: a simulated patient"""
 
+        if self.ifStreaming:
+            # update summary statistics
+            if simulated_patient.stateMonitor.survivalTime is not None:
+                self.statSurvivalTime.record(simulated_patient.stateMonitor.survivalTime)
+                self._nDeaths += _count_deaths(times=self.survivalCurveTimes,
+                                               survival_times=[simulated_patient.stateMonitor.survivalTime])
+            self.statNCancer.record(simulated_patient.stateMonitor.nCancer)
+            self.statNCancerDeath.record(simulated_patient.stateMonitor.nCancerDeath)
+            self.statCost.record(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost)
+            self.statUtility.record(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility)
+            return
+
         # record survival time and number of invasive cancer
         if simulated_patient.stateMonitor.survivalTime is not None:
             self.survivalTimes.append(simulated_patient.stateMonitor.survivalTime)
@@ -193,23 +611,391 @@ class CohortOutcomes:
         self.costs.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost)
         self.utilities.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility)
 
+    def set_expected_outcomes(self, pop_size, mean_survival_time, mean_cost, mean_utility,
+                              mean_n_cancer, mean_n_cancer_death, n_living_patients):
+        """ sets the cohort outcomes to their expected values (instead of summarizing simulated patients)
+        :param pop_size: population size of the cohort
+        :param mean_survival_time: expected survival time of patients who die during the simulation
+        :param mean_cost: expected discounted cost of a patient
+        :param mean_utility: expected discounted utility of a patient
+        :param mean_n_cancer: expected number of diagnosis of invasive cancer of a patient
+        :param mean_n_cancer_death: expected number of cancer death of a patient
+        :param n_living_patients: (array) expected number of living patients at the time points of the survival curve
+        """
+
+        # summary statistics
+        self.statSurvivalTime = ExpectedValueStat(
+            name='Survival time', mean=mean_survival_time, n=pop_size)
+        self.statNCancer = ExpectedValueStat(
+            name='Number of invasive cancer', mean=mean_n_cancer, n=pop_size)
+        self.statNCancerDeath = ExpectedValueStat(
+            name='Number of cancer death', mean=mean_n_cancer_death, n=pop_size)
+        self.statCost = ExpectedValueStat(name='Discounted cost', mean=mean_cost, n=pop_size)
+        self.statUtility = ExpectedValueStat(name='Discounted utility', mean=mean_utility, n=pop_size)
+
+        # survival curve
+        self.nLivingPatients = n_living_patients
+
+    def extract_outcomes(self, survival_times, costs, utilities, n_cancer, n_cancer_death):
+        """ extracts outcomes of a batch of simulated patients
+        :param survival_times: (array) survival times of patients who died during the simulation
+        :param costs: (array) discounted costs of patients
+        :param utilities: (array) discounted utilities of patients
+        :param n_cancer: (array) number of diagnosis of invasive cancer of patients
+        :param n_cancer_death: (array) number of cancer death of patients
+        """
+
+        if self.ifStreaming:
+            # update summary statistics
+            self.statSurvivalTime.record_batch(survival_times)
+            self._nDeaths += _count_deaths(times=self.survivalCurveTimes, survival_times=survival_times)
+            self.statNCancer.record_batch(n_cancer)
+            self.statNCancerDeath.record_batch(n_cancer_death)
+            self.statCost.record_batch(costs)
+            self.statUtility.record_batch(utilities)
+            return
+
+        self.survivalTimes.extend(np.asarray(survival_times).tolist())
+        self.costs.extend(np.asarray(costs).tolist())
+        self.utilities.extend(np.asarray(utilities).tolist())
+        self.nCancer.extend(np.asarray(n_cancer).tolist())
+        self.nCancerDeath.extend(np.asarray(n_cancer_death).tolist())
+
     def calculate_cohort_outcomes(self, initial_pop_size):
         """ calculates the cohort outcomes
         :param initial_pop_size: initial population size
         """
 
+        if self.ifStreaming:
+            # summary statistics and the number of deaths are already updated
+            self.nLivingPatients = initial_pop_size - np.cumsum(self._nDeaths)
+            return
+
         # summary statistics
-        self.statSurvivalTime = Stat.SummaryStat(name='Survival time', data=self.survivalTimes)
-        self.statNCancer = Stat.SummaryStat(name='Number of invasive cancer', data=self.nCancer)
-        self.statNCancerDeath = Stat.SummaryStat(name='Number of cancer death', data=self.nCancerDeath)
-        self.statCost = Stat.SummaryStat(name='Discounted cost', data=self.costs)
-        self.statUtility = Stat.SummaryStat(name='Discounted utility', data=self.utilities)
+        with Profiling.span('SummaryStat construction'):
+            self.statSurvivalTime = Stat.SummaryStat(name='Survival time', data=self.survivalTimes)
+            self.statNCancer = Stat.SummaryStat(name='Number of invasive cancer', data=self.nCancer)
+            self.statNCancerDeath = Stat.SummaryStat(name='Number of cancer death', data=self.nCancerDeath)
+            self.statCost = Stat.SummaryStat(name='Discounted cost', data=self.costs)
+            self.statUtility = Stat.SummaryStat(name='Discounted utility', data=self.utilities)
 
         # survival curve
-        self.nLivingPatients = Path.PrevalencePathBatchUpdate(
-            name='# of living patients',
-            initial_size=initial_pop_size,
-            times_of_changes=self.survivalTimes,
-            increments=[-1] * len(self.survivalTimes)
-        )
+        with Profiling.span('survival curves'):
+            self.nLivingPatients = initial_pop_size - np.cumsum(
+                _count_deaths(times=self.survivalCurveTimes, survival_times=self.survivalTimes))
+
+
+class ExpectedValueStat:
+    """ expected value of a patient outcome calculated analytically; it provides the statistics
+    of SummaryStat that are used to summarize cohorts """
+
+    def __init__(self, name, mean, n):
+        """
+        :param name: name of this statistics
+        :param mean: expected value of the outcome for one patient
+        :param n: number of patients in the cohort
+        """
+        self.name = name
+        self.mean = mean
+        self.n = n
+
+    def get_mean(self):
+        return self.mean
+
+    def get_total(self):
+        return self.mean * self.n
 
+
+class StreamingStat:
+    """ summary statistics (mean, variance, total, min and max) updated as observations arrive,
+    so that memory does not depend on the number of observations; it provides the statistics
+    of SummaryStat that are used to summarize cohorts """
+
+    def __init__(self, name):
+        """
+        :param name: name of this statistics
+        """
+        self.name = name
+        self.n = 0              # number of observations
+        self.mean = 0           # mean of observations
+        self._sumSqDev = 0      # sum of squared deviations from the mean
+        self.total = 0          # sum of observations
+        self.min = np.inf       # minimum observation
+        self.max = -np.inf      # maximum observation
+
+    def record(self, obs):
+        """ updates the statistics with a new observation (Welford's algorithm)
+        :param obs: observation
+        """
+        self.n += 1
+        delta = obs - self.mean
+        self.mean += delta / self.n
+        self._sumSqDev += delta * (obs - self.mean)
+        self.total += obs
+        self.min = min(self.min, obs)
+        self.max = max(self.max, obs)
+
+    def record_batch(self, obs):
+        """ updates the statistics with a batch of observations (Chan et al.'s parallel algorithm)
+        :param obs: (array) observations
+        """
+        obs = np.asarray(obs, dtype=float)
+        if obs.size == 0:
+            return
+
+        n = self.n + obs.size
+        batch_mean = obs.mean()
+        delta = batch_mean - self.mean
+        self._sumSqDev += ((obs - batch_mean) ** 2).sum() + delta ** 2 * self.n * obs.size / n
+        self.mean += delta * obs.size / n
+        self.n = n
+        self.total += obs.sum()
+        self.min = min(self.min, obs.min())
+        self.max = max(self.max, obs.max())
+
+    def get_mean(self):
+        return self.mean if self.n > 0 else np.nan
+
+    def get_total(self):
+        return self.total
+
+    def get_var(self):
+        return self._sumSqDev / (self.n - 1) if self.n > 1 else np.nan
+
+    def get_stdev(self):
+        return np.sqrt(self.get_var())
+
+    def get_min(self):
+        return self.min if self.n > 0 else np.nan
+
+    def get_max(self):
+        return self.max if self.n > 0 else np.nan
+
+
+def get_survival_curve_times(sim_length):
+    """
+    :param sim_length: simulation length
+    :return: (array) time points of survival curves (every SURVIVAL_CURVE_TIME_STEP from 0 to sim_length)
+    """
+    return np.append(np.arange(0, sim_length, Data.SURVIVAL_CURVE_TIME_STEP), sim_length)
+
+
+def _count_deaths(times, survival_times):
+    """
+    :param times: (array) time points of the survival curve
+    :param survival_times: (list or array) survival times
+    :return: (array) number of deaths after the previous time point and up to each time point
+    """
+    return np.bincount(np.searchsorted(times, survival_times, side='left'), minlength=len(times))
+
+
+def get_discounted_cost_and_utility(cost, utility, discount_rate, t0, t1, discount_factor_t0=None):
+    """ calculates the present value of continuous payments of cost and utility received over the period (t0, t1)
+    (discounted continuously); all arguments can be floats or arrays of the same size
+    :param cost: cost per unit of time
+    :param utility: utility per unit of time
+    :param discount_rate: discount rate
+    :param t0: start of the period
+    :param t1: end of the period
+    :param discount_factor_t0: exp(-discount_rate * t0) if already calculated
+    :return: (discounted cost, discounted utility, exp(-discount_rate * t1))
+    """
+
+    if discount_rate == 0:
+        weight = t1 - t0
+        discount_factor_t1 = 1
+    else:
+        if discount_factor_t0 is None:
+            discount_factor_t0 = np.exp(-discount_rate * t0)
+        discount_factor_t1 = np.exp(-discount_rate * t1)
+        weight = (discount_factor_t0 - discount_factor_t1) / discount_rate
+
+    return cost * weight, utility * weight, discount_factor_t1
+
+
+def _simulate_batch(rng, groups, initial_states, exit_rates, cum_jump_probs, cost_rates, utility_rates,
+                    discount_rate, sim_length, patient_ids=None, event_log=None):
+    """ simulates a batch of patients together; the current state, clock, and accumulated discounted cost
+    and utility of every patient are stored in arrays and all living patients are advanced by one event
+    at each iteration
+    :param rng: random number generator
+    :param groups: (array) index of the group (parameter set) of each patient
+    :param initial_states: (array) index of the initial state of each patient
+    :param exit_rates: (array) sum of rates out of each state, indexed by (group, state)
+    :param cum_jump_probs: (array) cumulative probabilities of the next state, indexed by (group, state, state)
+    :param cost_rates: (array) cost per unit of time, indexed by (group, state)
+    :param utility_rates: (array) utility per unit of time, indexed by (group, state)
+    :param discount_rate: discount rate
+    :param sim_length: simulation length
+    :param patient_ids: (array) id of each patient (required to log events)
+    :param event_log: (EventLogWriter) if provided, the initial state and every change of state of each
+        patient are written to this event log
+    :return: (survival_times, costs, utilities, n_cancer, n_cancer_death) arrays of the outcomes of each
+        patient (survival time is nan for patients who are alive at the end of the simulation)
+    """
+
+    pop_size = len(groups)
+
+    # state, clock and outcomes of each patient
+    states = np.array(initial_states)
+    times = np.zeros(pop_size)
+    costs = np.zeros(pop_size)
+    utilities = np.zeros(pop_size)
+    discount_factors = np.ones(pop_size)
+    n_cancer = np.zeros(pop_size, dtype=int)
+    n_cancer_death = np.zeros(pop_size, dtype=int)
+    survival_times = np.full(pop_size, np.nan)
+
+    # log the initial state of each patient
+    if event_log is not None:
+        event_log.add_events(patient_ids=patient_ids, states=states, times=times)
+
+    # indices of patients who are not in an absorbing state
+    active = np.flatnonzero(exit_rates[groups, states] > 0)
+
+    while active.size > 0:
+        current_groups = groups[active]
+        current_states = states[active]
+        t0 = times[active]
+
+        # find time until next event and the next state
+        # (random numbers are drawn for every patient of the batch, so the k-th event of a patient
+        # always uses the same random numbers and cohorts with the same id share random numbers)
+        t1 = t0 + rng.exponential(size=pop_size)[active] / exit_rates[current_groups, current_states]
+        new_states = (rng.random_sample(pop_size)[active][:, None]
+                      >= cum_jump_probs[current_groups, current_states]).sum(axis=1)
+
+        # patients whose next event occurs beyond simulation length stay in the
+        # current state until the end of the simulation
+        if_ended = t1 > sim_length
+        t1[if_ended] = sim_length
+        new_states[if_ended] = current_states[if_ended]
+
+        # update discounted cost and utility
+        with Profiling.span('cost and utility updates'):
+            discounted_costs, discounted_utilities, discount_factors[active] = get_discounted_cost_and_utility(
+                cost=cost_rates[current_groups, current_states],
+                utility=utility_rates[current_groups, current_states],
+                discount_rate=discount_rate,
+                t0=t0,
+                t1=t1,
+                discount_factor_t0=discount_factors[active])
+            costs[active] += discounted_costs
+            utilities[active] += discounted_utilities
+
+        # update number of diagnosis of invasive cancer and number of cancer death
+        n_cancer[active] += (current_states != HealthStates.LOCAL.value) \
+            & (new_states == HealthStates.LOCAL.value)
+        n_cancer_death[active] += (current_states != HealthStates.CANCER_DEATH.value) \
+            & (new_states == HealthStates.CANCER_DEATH.value)
+
+        # update survival time
+        if_died = np.isin(new_states, (HealthStates.CANCER_DEATH.value, HealthStates.NATUAL_DEATH.value))
+        survival_times[active[if_died]] = t1[if_died]
+
+        # log the changes of health state (patients whose next event occurs beyond simulation length
+        # do not change state)
+        if event_log is not None:
+            event_log.add_events(patient_ids=patient_ids[active[~if_ended]],
+                                 states=new_states[~if_ended],
+                                 times=t1[~if_ended])
+
+        # update health state and clock
+        states[active] = new_states
+        times[active] = t1
+
+        # keep patients who are still alive and within the simulation length
+        active = active[~if_ended & (exit_rates[current_groups, new_states] > 0)]
+
+    return survival_times, costs, utilities, n_cancer, n_cancer_death
+
+
+def _get_exit_rates_and_jump_probs(trans_rate_matrix):
+    """
+    :param trans_rate_matrix: transition rate matrix (diagonal elements are ignored)
+    :return: (exit_rates, jump_probs) where exit_rates[i] is the sum of rates out of state i and
+        jump_probs[i, j] is the probability that the next state is j when the process leaves state i
+    """
+
+    n_states = len(trans_rate_matrix)
+    rates = np.zeros((n_states, n_states))
+    for i, row in enumerate(trans_rate_matrix):
+        for j, rate in enumerate(row):
+            if i != j and rate is not None:
+                rates[i, j] = rate
+
+    exit_rates = rates.sum(axis=1)
+    jump_probs = np.zeros((n_states, n_states))
+    # absorbing states (sum of rates out of the state is 0) have no next state
+    if_transient = exit_rates > 0
+    jump_probs[if_transient] = rates[if_transient] / exit_rates[if_transient, None]
+
+    return exit_rates, jump_probs
+
+
+def _get_integral_of_expm(matrix, t):
+    """
+    :param matrix: (array) a square matrix A
+    :param t: upper limit of the integral
+    :return: the integral of expm(A*s) over s in (0, t), calculated from the matrix exponential
+        of the block matrix [[A, I], [0, 0]]
+    """
+
+    n = len(matrix)
+    block = np.zeros((2 * n, 2 * n))
+    block[:n, :n] = matrix
+    block[:n, n:] = np.eye(n)
+
+    return expm(block * t)[:n, n:]
+
+
+def _get_occupancy_probs(p0, generator, times):
+    """
+    :param p0: (array) initial state distribution
+    :param generator: (array) generator matrix of the continuous-time Markov model
+    :param times: (array) increasing time points starting at 0
+    :return: (array) state probabilities at each time point (one row per time point)
+    """
+
+    probs = np.zeros((len(times), len(p0)))
+    probs[0] = p0
+    step = None
+    step_matrix = None
+    for k in range(1, len(times)):
+        # the grid is uniform (except possibly its last step), so the transition probability matrix
+        # over a step is calculated again only when the step changes
+        if step is None or abs(times[k] - times[k - 1] - step) > 1e-12 * step:
+            step = times[k] - times[k - 1]
+            step_matrix = expm(generator * step)
+        probs[k] = probs[k - 1] @ step_matrix
+
+    return probs
+
+
+def _get_cumulative_jump_probs(jump_probs):
+    """
+    :param jump_probs: (array) probabilities of the next state (rows of absorbing states are 0)
+    :return: cumulative probabilities of the next state; the last element of each row of a transient state
+        is exactly 1 so that a uniform random number in [0, 1) always selects a valid state
+    """
+
+    cum_probs = np.cumsum(jump_probs, axis=-1)
+    totals = cum_probs[..., -1:]
+    return np.divide(cum_probs, totals, out=np.ones_like(cum_probs), where=totals > 0)
+
+
+def _get_cost_and_utility_rates(parameters, exit_rates):
+    """
+    :param parameters: parameters
+    :param exit_rates: (array) sum of rates out of each state
+    :return: (cost_rates, utility_rates) cost and utility per unit of time in each state
+        (no cost or utility is accrued in absorbing states)
+    """
+
+    cost_rates = np.zeros(len(exit_rates))
+    utility_rates = np.zeros(len(exit_rates))
+    for s in np.flatnonzero(exit_rates > 0):
+        cost_rates[s] = parameters.annualStateCosts[s] + parameters.annualTreatmentCost
+        utility_rates[s] = parameters.annualStateUtilities[s]
+
+    return cost_rates, utility_rates
@@ -1,66 +1,522 @@
+import hashlib
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import scipy.stats as stat
 
+import FileSupport
+import InputData as Data
+import Profiling
+import ResultCache
 import SimPy.Statistics as Stat
-from MarkovModelClasses import Cohort
-from ProbilisticParamClasses import ParameterGenerator
+from MarkovModelClasses import Cohort, CohortEngines
+from ProbilisticParamClasses import ParameterGenerator, SamplingMethods
 
 
 class MultiCohort:
     """ simulates multiple cohorts with different parameters """
 
-    def __init__(self, ids, pop_size, therapy, race):
+    def __init__(self, ids, pop_size, therapy, race, engine=CohortEngines.PATIENT, param_seed=None,
+                 if_streaming=False, checkpoint_dir=None, sampling=SamplingMethods.RANDOM, event_log_dir=None):
         """
         :param ids: (list) of ids for cohorts to simulate
         :param pop_size: (int) population size of cohorts to simulate
         :param therapy: selected therapy
+        :param race: race of the patients
+        :param engine: (CohortEngines) method to simulate each cohort
+        :param param_seed: if provided, the parameter sets of all cohorts are drawn at once from a random
+            number generator with this seed (otherwise the parameter set of the i-th cohort is drawn
+            from a random number generator with seed i)
+        :param if_streaming: set to True to summarize patient outcomes of each cohort in constant memory
+        :param checkpoint_dir: if provided, the outcomes of each simulated cohort are written to this
+            directory as soon as the cohort is simulated, and cohorts whose outcomes are already in this
+            directory are not simulated again (to resume an interrupted run or to extend a finished run)
+        :param sampling: (SamplingMethods) method to draw parameter sets; with a Latin hypercube or Sobol
+            design, the parameter sets of all cohorts are drawn at once from one design (seeded by param_seed,
+            or 0 if param_seed is not provided) and cohorts added later are drawn from a new design
+        :param event_log_dir: if provided, the events of the patients of each simulated cohort are written to
+            a file in this directory (see EventLog); outcomes are then not read from the result cache so that
+            every cohort is simulated
         """
-        self.ids = ids
+        self.ids = list(ids)
         self.popSize = pop_size
         self.therapy = therapy
         self.race = race
+        self.engine = engine
+        self.paramSeed = param_seed
+        self.ifStreaming = if_streaming
+        self.sampling = sampling
+        self.checkpointDir = checkpoint_dir
+        self.eventLogDir = event_log_dir
         self.paramSets = []  # list of parameter sets each of which corresponds to a cohort
+        self.nSimulatedCohorts = 0  # number of cohorts whose outcomes are extracted
         self.multiCohortOutcomes = MultiCohortOutcomes()
+        self._checkpointedOutcomes = {}  # outcomes read from the checkpoint directory (keyed by cohort id)
+
+        # outcomes of the cohort trace are not comparable with those of the engines used in other analyses
+        if self.engine in (CohortEngines.TRACE, CohortEngines.TRACE_HALF_CYCLE):
+            warnings.warn('Engine {} allows at most one transition per annual cycle, so the outcomes of this '
+                          'probabilistic analysis are not comparable with those of the continuous-time engines '
+                          '(PATIENT, VECTORIZED and ANALYTIC).'.format(self.engine.name), stacklevel=2)
+
+        # make sure the checkpoint directory belongs to a run of this multi-cohort
+        if self.checkpointDir is not None:
+            self.__open_checkpoint_dir()
+
+    def __open_checkpoint_dir(self):
+        """ creates the checkpoint directory or, if it already exists, checks that it was created
+        for a multi-cohort with the same settings, input data and code """
+
+        # settings that the outcomes of checkpointed cohorts depend on
+        manifest = {'therapy': self.therapy.name,
+                    'race': self.race.name,
+                    'pop_size': self.popSize,
+                    'engine': self.engine.name,
+                    'param_seed': self.paramSeed,
+                    'sampling': self.sampling.name,
+                    'input_data_version': ResultCache.get_input_data_version(),
+                    'code_version': ResultCache.get_code_version()}
+
+        file_name = os.path.join(self.checkpointDir, 'manifest.json')
+        if os.path.exists(file_name):
+            with open(file_name) as file:
+                saved_manifest = json.load(file)
+            if saved_manifest != manifest:
+                raise ValueError('Checkpoint directory {} was created for a multi-cohort with different '
+                                 'settings ({} instead of {}).'.format(self.checkpointDir, saved_manifest, manifest))
+        else:
+            os.makedirs(self.checkpointDir, exist_ok=True)
+            with open(file_name, 'w') as file:
+                json.dump(manifest, file)
+
+    def __get_checkpoint_file_name(self, cohort_id):
+        """
+        :param cohort_id: id of a cohort
+        :return: name of the file that stores the outcomes of this cohort in the checkpoint directory
+        """
+        return os.path.join(self.checkpointDir, 'cohort-{}.npz'.format(cohort_id))
+
+    def get_event_log_file_name(self, cohort_id):
+        """
+        :param cohort_id: id of a cohort
+        :return: name of the file that stores the events of the patients of this cohort (None if events
+            are not logged)
+        """
+        if self.eventLogDir is None:
+            return None
+        return os.path.join(self.eventLogDir, 'events-{}.bin'.format(cohort_id))
 
     def __populate_parameter_sets(self):
+        """ creates parameter sets for cohorts that do not have one yet """
+
+        # position of the first cohort without a parameter set
+        start = len(self.paramSets)
+        if start == len(self.ids):
+            return
 
         # create a parameter set generator
         param_generator = ParameterGenerator(therapy=self.therapy, race=self.race)
 
-        # create as many sets of parameters as the number of cohorts
-        for i in range(len(self.ids)):
+        if self.paramSeed is not None or self.sampling != SamplingMethods.RANDOM:
+            # draw all new parameter sets at once
+            self.paramSets.extend(param_generator.get_new_parameter_sets(
+                n=len(self.ids) - start,
+                rng=np.random.RandomState(seed=[0 if self.paramSeed is None else self.paramSeed, start]),
+                sampling=self.sampling))
+            return
+
+        # create as many sets of parameters as the number of new cohorts
+        for i in range(start, len(self.ids)):
             # create a new random number generator for each parameter set
             rng = np.random.RandomState(seed=i)
             # get and store a new set of parameter
             self.paramSets.append(param_generator.get_new_parameters(rng=rng))
 
-    def simulate(self, sim_length):
-        """ simulates all cohorts
+    def add_cohorts(self, ids):
+        """ adds cohorts to this multi-cohort (they are simulated by the next call to simulate)
+        :param ids: (list) of ids for cohorts to add
+        """
+        self.ids.extend(ids)
+
+    def simulate(self, sim_length, n_workers=1):
+        """ simulates all cohorts that are not simulated yet
+        :param sim_length: simulation length
+        :param n_workers: number of processes to simulate cohorts in parallel
+            (1 to simulate cohorts serially, None to use all available cores)
+        """
+
+        simulate_multi_cohorts(multi_cohorts=[self], sim_length=sim_length, n_workers=n_workers)
+
+    def get_result_cache_key(self, sim_length):
+        """
         :param sim_length: simulation length
+        :return: key of the outcomes of this multi-cohort in the result cache (None if the result cache
+            is disabled, if some cohorts of this multi-cohort are already simulated or if events are logged)
+        """
+        if Data.RESULT_CACHE_DIR is None or self.nSimulatedCohorts > 0 or self.eventLogDir is not None:
+            return None
+        return ResultCache.get_cache_key(multi_cohort=self, sim_length=sim_length)
+
+    def set_cached_outcomes(self, multi_cohort_outcomes):
+        """ uses outcomes found in the result cache instead of simulating the cohorts
+        :param multi_cohort_outcomes: outcomes of all cohorts of this multi-cohort
+        """
+
+        # parameter sets are still needed to analyze outcomes against parameter values
+        self.__populate_parameter_sets()
+        self.multiCohortOutcomes = multi_cohort_outcomes
+        self.nSimulatedCohorts = len(self.ids)
+
+    def get_cohorts(self, sim_length):
+        """ creates the parameter sets and the cohorts that are not simulated yet
+        :param sim_length: simulation length (outcomes in the checkpoint directory must be simulated
+            over the same length)
+        :return: (list) of cohorts (one for each cohort id that is not simulated yet and
+            whose outcomes are not in the checkpoint directory)
         """
 
         # create parameter sets
         self.__populate_parameter_sets()
 
-        for i in range(len(self.ids)):
-            # create a cohort
-            cohort = Cohort(id=self.ids[i],
-                            pop_size=self.popSize,
-                            parameters=self.paramSets[i])
+        # create cohorts
+        cohorts = []
+        for i in range(self.nSimulatedCohorts, len(self.ids)):
+            # read the outcomes of this cohort if it was simulated before
+            # (outcomes simulated with a different parameter set are not reused; this happens when parameter
+            # sets are drawn in batches and the batches differ from those of the checkpointed run)
+            if self.checkpointDir is not None:
+                file_name = self.__get_checkpoint_file_name(self.ids[i])
+                if os.path.exists(file_name):
+                    outcomes = _read_checkpoint(file_name=file_name, position=i,
+                                                parameter_hash=_get_parameter_hash(self.paramSets[i]),
+                                                sim_length=sim_length)
+                    if outcomes is not None:
+                        self._checkpointedOutcomes[self.ids[i]] = outcomes
+                        continue
+            cohorts.append(Cohort(id=self.ids[i],
+                                  pop_size=self.popSize,
+                                  parameters=self.paramSets[i],
+                                  engine=self.engine,
+                                  if_streaming=self.ifStreaming,
+                                  event_log_file=self.get_event_log_file_name(self.ids[i])))
+        return cohorts
+
+    def write_checkpoint(self, simulated_cohort, sim_length):
+        """ writes the outcomes of a simulated cohort to the checkpoint directory (if there is one)
+        :param simulated_cohort: a cohort returned by get_cohorts after being simulated
+        :param sim_length: simulation length of the cohort
+        """
+
+        if self.checkpointDir is None:
+            return
+
+        # position of this cohort in the multi-cohort
+        position = self.ids.index(simulated_cohort.id, self.nSimulatedCohorts)
+        FileSupport.write_file_atomically(
+            file_name=self.__get_checkpoint_file_name(simulated_cohort.id),
+            write=lambda file: np.savez(file, position=position, sim_length=sim_length,
+                                        parameter_hash=_get_parameter_hash(self.paramSets[position]),
+                                        **_get_cohort_summary(simulated_cohort=simulated_cohort)))
+
+    def extract_outcomes(self, simulated_cohorts):
+        """ extracts the outcomes of simulated cohorts (and of cohorts read from the checkpoint directory)
+        and calculates the summary statistics
+        :param simulated_cohorts: (list) of simulated cohorts returned by get_cohorts
+        """
 
-            # simulate the cohort
-            cohort.simulate(sim_length=sim_length)
+        # outcomes of cohorts that are not extracted yet, keyed by cohort id
+        outcomes = self._checkpointedOutcomes
+        for cohort in simulated_cohorts:
+            outcomes[cohort.id] = _get_cohort_summary(simulated_cohort=cohort)
 
-            # extract the outcomes of this simulated cohort
-            self.multiCohortOutcomes.extract_outcomes(simulated_cohort=cohort)
+        # extract outcomes in the order of cohort ids
+        for i in range(self.nSimulatedCohorts, len(self.ids)):
+            self.multiCohortOutcomes.add_cohort_outcomes(**outcomes[self.ids[i]])
+        self.nSimulatedCohorts = len(self.ids)
+        self._checkpointedOutcomes = {}
 
         # calculate the summary statistics of outcomes from all cohorts
         self.multiCohortOutcomes.calculate_summary_stats()
 
 
+def simulate_multi_cohorts(multi_cohorts, sim_length, n_workers=1):
+    """ simulates the cohorts of several multi-cohorts that are not simulated yet; cohorts of all
+    multi-cohorts are scheduled together over the worker processes
+    :param multi_cohorts: (list) of multi-cohorts
+    :param sim_length: simulation length (or a list of simulation lengths, one for each multi-cohort)
+    :param n_workers: number of processes to simulate cohorts in parallel
+            (1 to simulate cohorts serially, None to use all available cores)
+    """
+
+    if not isinstance(sim_length, (list, tuple)):
+        sim_length = [sim_length] * len(multi_cohorts)
+
+    # use the outcomes of multi-cohorts found in the result cache
+    cache_keys = []     # keys of multi-cohorts to store in the result cache after simulation
+    for multi_cohort, length in zip(multi_cohorts, sim_length):
+        key = multi_cohort.get_result_cache_key(sim_length=length)
+        if key is not None:
+            outcomes = ResultCache.load(key=key)
+            if outcomes is not None:
+                multi_cohort.set_cached_outcomes(multi_cohort_outcomes=outcomes)
+                key = None
+        cache_keys.append(key)
+
+    # collect cohorts of all multi-cohorts
+    cohorts_of_multi_cohorts = []
+    cohorts = []
+    sim_lengths = []
+    owners = []     # multi-cohort of each cohort
+    for multi_cohort, length in zip(multi_cohorts, sim_length):
+        cohorts_of_multi_cohorts.append(multi_cohort.get_cohorts(sim_length=length))
+        cohorts.extend(cohorts_of_multi_cohorts[-1])
+        sim_lengths.extend([length] * len(cohorts_of_multi_cohorts[-1]))
+        owners.extend([multi_cohort] * len(cohorts_of_multi_cohorts[-1]))
+
+    # simulate all cohorts (and checkpoint each cohort as soon as it is simulated)
+    simulated_cohorts = simulate_cohorts(cohorts=cohorts, sim_length=sim_lengths, n_workers=n_workers,
+                                         callback=lambda i, cohort: owners[i].write_checkpoint(
+                                             simulated_cohort=cohort, sim_length=sim_lengths[i]))
+
+    # return the simulated cohorts to their multi-cohorts
+    i = 0
+    for multi_cohort, cohorts_of_multi_cohort in zip(multi_cohorts, cohorts_of_multi_cohorts):
+        n = len(cohorts_of_multi_cohort)
+        multi_cohort.extract_outcomes(simulated_cohorts=simulated_cohorts[i:i + n])
+        i += n
+
+    # store the outcomes of new simulations in the result cache
+    for multi_cohort, key in zip(multi_cohorts, cache_keys):
+        if key is not None:
+            ResultCache.store(key=key, multi_cohort_outcomes=multi_cohort.multiCohortOutcomes)
+
+
+def simulate_until_converged(multi_cohorts, sim_length, batch_size, tolerances, alpha=0.05, wtp=None,
+                             max_cohorts=None, max_seconds=None, n_workers=1):
+    """ keeps adding batches of cohorts to one multi-cohort, or to a pair of multi-cohorts (without and with
+    screening), until the half-lengths of the t-based confidence intervals of the estimated means are
+    within the specified tolerances or the compute budget is used up
+    :param multi_cohorts: (list) of one multi-cohort, or of two multi-cohorts [no screening, biennial
+        screening] for which the tolerances apply to the incremental outcomes of the second with respect
+        to the first (paired by cohort)
+    :param sim_length: simulation length
+    :param batch_size: number of cohorts to add to each multi-cohort at each step
+    :param tolerances: (dictionary) of target half-lengths of confidence intervals with keys among
+        'cost', 'qaly' and 'nmb' (incremental net monetary benefit at the willingness-to-pay 'wtp')
+    :param alpha: significance level of confidence intervals
+    :param wtp: willingness-to-pay for one additional QALY (required if 'nmb' is in tolerances)
+    :param max_cohorts: maximum number of cohorts in each multi-cohort (None for no limit)
+    :param max_seconds: maximum wall-clock time in seconds (None for no limit)
+    :param n_workers: number of processes to simulate cohorts in parallel
+            (1 to simulate cohorts serially, None to use all available cores)
+    :return: (if_converged, half_lengths) where half_lengths is a dictionary of the half-lengths of
+        confidence intervals of the outcomes in tolerances when simulation stopped
+    """
+
+    if 'nmb' in tolerances and wtp is None:
+        raise ValueError('wtp should be provided to set a tolerance for the net monetary benefit.')
+    if max_cohorts is None and max_seconds is None:
+        raise ValueError('Either max_cohorts or max_seconds should be provided.')
+
+    start_time = time.time()
+    while True:
+        # simulate cohorts that are not simulated yet
+        simulate_multi_cohorts(multi_cohorts=multi_cohorts, sim_length=sim_length, n_workers=n_workers)
+
+        # half-lengths of confidence intervals
+        half_lengths = _get_ci_half_lengths(multi_cohorts=multi_cohorts, alpha=alpha, wtp=wtp,
+                                            outcomes=tolerances.keys())
+        if all(half_lengths[key] <= tol for key, tol in tolerances.items()):
+            return True, half_lengths
+
+        # stop if the compute budget is used up
+        n_cohorts = len(multi_cohorts[0].ids)
+        if max_cohorts is not None and n_cohorts >= max_cohorts:
+            return False, half_lengths
+        if max_seconds is not None and time.time() - start_time >= max_seconds:
+            return False, half_lengths
+
+        # add a new batch of cohorts
+        n_new = batch_size if max_cohorts is None else min(batch_size, max_cohorts - n_cohorts)
+        new_ids = _get_new_cohort_ids(multi_cohorts=multi_cohorts, n=n_new)
+        for multi_cohort, ids in zip(multi_cohorts, new_ids):
+            multi_cohort.add_cohorts(ids=ids)
+
+
+def _get_new_cohort_ids(multi_cohorts, n):
+    """
+    :param multi_cohorts: (list) of multi-cohorts
+    :param n: number of new ids for each multi-cohort
+    :return: (list) of lists of n new cohort ids (one list for each multi-cohort); multi-cohorts that share
+        cohort ids (common random numbers) get the same new ids and otherwise each multi-cohort gets
+        ids that are not used by any other multi-cohort
+    """
+
+    start = max(max(multi_cohort.ids, default=-1) for multi_cohort in multi_cohorts) + 1
+    if all(multi_cohort.ids == multi_cohorts[0].ids for multi_cohort in multi_cohorts):
+        return [list(range(start, start + n))] * len(multi_cohorts)
+    else:
+        return [list(range(start + k * n, start + (k + 1) * n)) for k in range(len(multi_cohorts))]
+
+
+def _get_ci_half_lengths(multi_cohorts, alpha, wtp, outcomes):
+    """
+    :param multi_cohorts: (list) of one or two simulated multi-cohorts
+    :param alpha: significance level
+    :param wtp: willingness-to-pay for one additional QALY
+    :param outcomes: outcomes among 'cost', 'qaly' and 'nmb'
+    :return: (dictionary) half-length of the t-based confidence interval of the mean of each outcome
+        (incremental outcomes if two multi-cohorts are provided)
+    """
+
+    costs = np.array(multi_cohorts[-1].multiCohortOutcomes.meanCosts)
+    qalys = np.array(multi_cohorts[-1].multiCohortOutcomes.meanQALYs)
+    if len(multi_cohorts) == 2:
+        costs = costs - np.array(multi_cohorts[0].multiCohortOutcomes.meanCosts)
+        qalys = qalys - np.array(multi_cohorts[0].multiCohortOutcomes.meanQALYs)
+
+    observations = {'cost': costs, 'qaly': qalys}
+    if wtp is not None:
+        observations['nmb'] = wtp * qalys - costs
+
+    half_lengths = {}
+    for key in outcomes:
+        obs = observations[key]
+        if len(obs) < 2:
+            half_lengths[key] = np.inf
+        else:
+            half_lengths[key] = stat.t.ppf(1 - alpha / 2, len(obs) - 1) * np.std(obs, ddof=1) / np.sqrt(len(obs))
+
+    return half_lengths
+
+
+def simulate_cohorts(cohorts, sim_length, n_workers=1, callback=None):
+    """ simulates a list of cohorts
+    :param cohorts: (list) of cohorts to simulate
+    :param sim_length: simulation length (or a list of simulation lengths, one for each cohort)
+    :param n_workers: number of processes to simulate cohorts in parallel
+            (1 to simulate cohorts serially, None to use all available cores)
+    :param callback: if provided, callback(i, simulated_cohort) is called for the i-th cohort
+            as soon as it is simulated (and all cohorts before it are simulated)
+    :return: (list) of simulated cohorts in the same order as the cohorts provided
+    """
+
+    if not isinstance(sim_length, (list, tuple)):
+        sim_length = [sim_length] * len(cohorts)
+
+    if n_workers == 1:
+        for i, (cohort, length) in enumerate(zip(cohorts, sim_length)):
+            cohort.simulate(sim_length=length)
+            if callback is not None:
+                callback(i, cohort)
+        return cohorts
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+
+    simulated_cohorts = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # results are returned in order as they become available
+        for i, (cohort, timings) in enumerate(executor.map(_simulate_cohort,
+                                                           cohorts,
+                                                           sim_length,
+                                                           [Profiling.is_enabled()] * len(cohorts),
+                                                           chunksize=max(1, len(cohorts) // (4 * n_workers)))):
+            # add the time spent in each phase by the worker process
+            Profiling.add_timings(timings)
+            simulated_cohorts.append(cohort)
+            if callback is not None:
+                callback(i, cohort)
+    return simulated_cohorts
+
+
+def _get_cohort_summary(simulated_cohort):
+    """
+    :param simulated_cohort: a cohort after being simulated
+    :return: (dictionary) of the outcomes of this cohort that are used by MultiCohortOutcomes
+    """
+    outcomes = simulated_cohort.cohortOutcomes
+    return {'mean_survival_time': outcomes.statSurvivalTime.get_mean(),
+            'mean_n_cancer': outcomes.statNCancer.get_mean(),
+            'n_cancer_death': outcomes.statNCancerDeath.get_total(),
+            'mean_cost': outcomes.statCost.get_mean(),
+            'mean_qaly': outcomes.statUtility.get_mean(),
+            'survival_curve_times': outcomes.survivalCurveTimes,
+            'n_living_patients': outcomes.nLivingPatients}
+
+
+def _get_parameter_hash(parameters):
+    """
+    :param parameters: parameter set of a cohort
+    :return: (string) hash of the values of the parameter set
+    """
+    sha = hashlib.sha1()
+    for values in (parameters.transRateMatrix, parameters.transProbMatrix, parameters.annualStateCosts,
+                   parameters.annualStateUtilities, parameters.annualTreatmentCost, parameters.discountRate):
+        # missing values (for example, diagonal elements of rate matrices) are hashed as nan
+        sha.update(np.array(values, dtype=float).tobytes())
+    return sha.hexdigest()
+
+
+def _read_checkpoint(file_name, position, parameter_hash, sim_length):
+    """
+    :param file_name: name of a file written by MultiCohort.write_checkpoint
+    :param position: position of the cohort in the multi-cohort
+    :param parameter_hash: hash of the parameter set of the cohort at this position
+    :param sim_length: simulation length of the cohort
+    :return: (dictionary) of the outcomes of the cohort stored in this file (None if the outcomes were
+        simulated with a different parameter set or the file does not record the simulation length)
+    """
+    with np.load(file_name) as data:
+        # the parameter set of a cohort depends on its position in the multi-cohort
+        if int(data['position']) != position:
+            raise ValueError('Cohort outcomes in {} were simulated at position {} of the multi-cohort '
+                             'and cannot be reused at position {}.'.format(file_name, int(data['position']), position))
+        if 'parameter_hash' not in data or str(data['parameter_hash']) != parameter_hash:
+            return None
+        # outcomes over a different time horizon cannot be combined with the outcomes of other cohorts
+        if 'sim_length' not in data:
+            return None
+        if float(data['sim_length']) != sim_length:
+            raise ValueError('Cohort outcomes in {} were simulated over {} years and cannot be reused for a '
+                             'simulation length of {}.'.format(file_name, float(data['sim_length']), sim_length))
+        return {'mean_survival_time': float(data['mean_survival_time']),
+                'mean_n_cancer': float(data['mean_n_cancer']),
+                'n_cancer_death': float(data['n_cancer_death']),
+                'mean_cost': float(data['mean_cost']),
+                'mean_qaly': float(data['mean_qaly']),
+                'survival_curve_times': data['survival_curve_times'],
+                'n_living_patients': data['n_living_patients']}
+
+
+def _simulate_cohort(cohort, sim_length, if_profiling=False):
+    """ simulates a cohort in a worker process
+    :param cohort: cohort to simulate
+    :param sim_length: simulation length
+    :param if_profiling: set to True to record the time spent in each phase
+    :return: (the simulated cohort, the time spent in each phase while simulating this cohort)
+    """
+
+    # record only the phases of this cohort
+    Profiling.reset()
+    if if_profiling:
+        Profiling.enable()
+    else:
+        Profiling.disable()
+
+    cohort.simulate(sim_length=sim_length)
+    return cohort, Profiling.get_timings()
+
+
 class MultiCohortOutcomes:
     def __init__(self):
 
-        self.survivalCurves = []  # list of survival curves from all simulated cohorts
+        self.survivalCurveTimes = None  # time points shared by the survival curves of all cohorts
+        self.survivalCurves = None  # (array) survival curves from all simulated cohorts (one row per cohort)
+        self._newSurvivalCurves = []    # survival curves extracted since the last summary statistics
         self.meanSurvivalTimes = []  # list of average patient survival time from each simulated cohort
         self.meanNCancer = []     # list of average number of diagnosis of invasive cancer from each simulated cohort
         self.meanCosts = []          # list of average patient cost from each simulated cohort
@@ -78,38 +534,81 @@ class MultiCohortOutcomes:
         """ extracts outcomes of a simulated cohort
         :param simulated_cohort: a cohort after being simulated"""
 
+        self.add_cohort_outcomes(**_get_cohort_summary(simulated_cohort=simulated_cohort))
+
+    def add_cohort_outcomes(self, mean_survival_time, mean_n_cancer, n_cancer_death, mean_cost, mean_qaly,
+                            survival_curve_times, n_living_patients):
+        """ adds the outcomes of a simulated cohort
+        :param mean_survival_time: average patient survival time of the cohort
+        :param mean_n_cancer: average number of diagnosis of invasive cancer of the cohort
+        :param n_cancer_death: number of cancer death of the cohort
+        :param mean_cost: average patient cost of the cohort
+        :param mean_qaly: average patient QALY of the cohort
+        :param survival_curve_times: (array) time points of the survival curve of the cohort
+        :param n_living_patients: (array) number of living patients at each time point
+        """
+
         # append the survival curve of this cohort
-        self.survivalCurves.append(simulated_cohort.cohortOutcomes.nLivingPatients)
+        if self.survivalCurveTimes is None:
+            self.survivalCurveTimes = survival_curve_times
+        elif not np.array_equal(self.survivalCurveTimes, survival_curve_times):
+            raise ValueError('Survival curves of all cohorts should be calculated at the same time points '
+                             '(cohorts should be simulated with the same simulation length).')
+        self._newSurvivalCurves.append(n_living_patients)
 
         # store mean survival time from this cohort
-        self.meanSurvivalTimes.append(simulated_cohort.cohortOutcomes.statSurvivalTime.get_mean())
+        self.meanSurvivalTimes.append(mean_survival_time)
         # store mean number of invasive cancer from this cohort
-        self.meanNCancer.append(simulated_cohort.cohortOutcomes.statNCancer.get_mean())
+        self.meanNCancer.append(mean_n_cancer)
         # store total number of cancer death from this cohort
-        self.nCancerDeath.append(simulated_cohort.cohortOutcomes.statNCancerDeath.get_total())
+        self.nCancerDeath.append(n_cancer_death)
         # store mean cost from this cohort
-        self.meanCosts.append(simulated_cohort.cohortOutcomes.statCost.get_mean())
+        self.meanCosts.append(mean_cost)
         # store mean QALY from this cohort
-        self.meanQALYs.append(simulated_cohort.cohortOutcomes.statUtility.get_mean())
+        self.meanQALYs.append(mean_qaly)
 
     def calculate_summary_stats(self):
         """
         calculate the summary statistics
         """
 
-        # summary statistics of mean survival time
-        self.statMeanSurvivalTime = Stat.SummaryStat(name='Average survival time',
-                                                     data=self.meanSurvivalTimes)
-        # summary statistics of mean number of invasive cancer
-        self.statMeanNCancer = Stat.SummaryStat(name='Average number of invasive breast cancer',
-                                                data=self.meanNCancer)
-        # summary statistics of total number of cancer death
-        self.statNCancerDeath = Stat.SummaryStat(name = 'Total number of invasive cancer death',
-                                                 data = self.nCancerDeath)
-
-        # summary statistics of mean cost
-        self.statMeanCost = Stat.SummaryStat(name='Average cost',
-                                             data=self.meanCosts)
-        # summary statistics of mean QALY
-        self.statMeanQALY = Stat.SummaryStat(name='Average QALY',
-                                             data=self.meanQALYs)
+        # add the new survival curves to the array of survival curves
+        if len(self._newSurvivalCurves) > 0:
+            with Profiling.span('survival curves'):
+                new_curves = np.array(self._newSurvivalCurves)
+                if self.survivalCurves is None:
+                    self.survivalCurves = new_curves
+                else:
+                    self.survivalCurves = np.vstack((self.survivalCurves, new_curves))
+                self._newSurvivalCurves = []
+
+        with Profiling.span('SummaryStat construction'):
+            # summary statistics of mean survival time
+            self.statMeanSurvivalTime = Stat.SummaryStat(name='Average survival time',
+                                                         data=self.meanSurvivalTimes)
+            # summary statistics of mean number of invasive cancer
+            self.statMeanNCancer = Stat.SummaryStat(name='Average number of invasive breast cancer',
+                                                    data=self.meanNCancer)
+            # summary statistics of total number of cancer death
+            self.statNCancerDeath = Stat.SummaryStat(name = 'Total number of invasive cancer death',
+                                                     data = self.nCancerDeath)
+
+            # summary statistics of mean cost
+            self.statMeanCost = Stat.SummaryStat(name='Average cost',
+                                                 data=self.meanCosts)
+            # summary statistics of mean QALY
+            self.statMeanQALY = Stat.SummaryStat(name='Average QALY',
+                                                 data=self.meanQALYs)
+
+    def get_mean_survival_curve(self):
+        """
+        :return: (array) average number of living patients at each time point of the survival curves
+        """
+        return self.survivalCurves.mean(axis=0)
+
+    def get_survival_curve_interval(self, alpha):
+        """
+        :param alpha: significance level
+        :return: (lower, upper) arrays of the percentile interval of the survival curves at each time point
+        """
+        return np.percentile(self.survivalCurves, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
@@ -1,7 +1,8 @@
+import csv
+import numpy as np
 import InputData as D
-import SimPy.EconEval as Econ
-import SimPy.Plots.Histogram as Hist
-import SimPy.Plots.SamplePaths as Path
+import NetBenefitAnalysis as NetBenefit
+import Profiling
 import SimPy.Statistics as Stat
 
 
@@ -55,21 +56,18 @@ def print_outcomes(multi_cohort_outcomes, therapy_name, race):
     print("")
 
 
+@Profiling.profiled('plotting')
 def plot_survival_curves_and_histograms(multi_cohort_outcomes_no, multi_cohort_outcomes_bi):
     """ plot the survival curves and the histograms of survival times
     :param multi_cohort_outcomes_no: outcomes of a multi-cohort simulated without screening
     :param multi_cohort_outcomes_bi: outcomes of a multi-cohort simulated with biennial screening
     """
 
-    # get survival curves of both treatments
-    sets_of_survival_curves = [
-        multi_cohort_outcomes_no.survivalCurves,
-        multi_cohort_outcomes_bi.survivalCurves
-    ]
+    import SimPy.Plots.Histogram as Hist
 
-    # graph survival curve
-    Path.plot_sets_of_sample_paths(
-        sets_of_sample_paths=sets_of_survival_curves,
+    # graph survival curves of both treatments
+    plot_survival_curves(
+        sets_of_multi_cohort_outcomes=[multi_cohort_outcomes_no, multi_cohort_outcomes_bi],
         title='Survival Curves',
         x_label='Simulation Time Step (year)',
         y_label='Number of Patients Alive',
@@ -115,6 +113,37 @@ def plot_survival_curves_and_histograms(multi_cohort_outcomes_no, multi_cohort_o
     )
 
 
+@Profiling.profiled('plotting')
+def plot_survival_curves(sets_of_multi_cohort_outcomes, title, x_label, y_label, legends, color_codes,
+                         transparency=0.4):
+    """ plots the average survival curve and the uncertainty band of survival curves of multi-cohorts
+    :param sets_of_multi_cohort_outcomes: (list) of outcomes of simulated multi-cohorts
+    :param title: title of the figure
+    :param x_label: x-axis label
+    :param y_label: y-axis label
+    :param legends: (list) of legends (one for each multi-cohort)
+    :param color_codes: (list) of colors (one for each multi-cohort)
+    :param transparency: transparency of the uncertainty bands
+    """
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    for outcomes, legend, color in zip(sets_of_multi_cohort_outcomes, legends, color_codes):
+        # prediction interval of survival curves
+        lower, upper = outcomes.get_survival_curve_interval(alpha=D.ALPHA)
+        ax.fill_between(outcomes.survivalCurveTimes, lower, upper, color=color, alpha=transparency, linewidth=0)
+        # average survival curve
+        ax.plot(outcomes.survivalCurveTimes, outcomes.get_mean_survival_curve(), color=color, label=legend)
+
+    ax.set_title(title)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.set_ylim(bottom=0)
+    ax.legend()
+    plt.show()
+
+
 def print_comparative_outcomes(multi_cohort_outcomes_no, multi_cohort_outcomes_bi):
     """ prints average increase in survival time, discounted cost, and discounted utility
     under combination therapy compared to mono therapy
@@ -183,12 +212,47 @@ def print_comparative_outcomes(multi_cohort_outcomes_no, multi_cohort_outcomes_b
           estimate_PI)
 
 
-def report_CEA_CBA(multi_cohort_outcomes_no, multi_cohort_outcomes_bi):
+@Profiling.profiled('cost-effectiveness analysis')
+def report_CEA_CBA(multi_cohort_outcomes_no, multi_cohort_outcomes_bi, race=None, file_name='CETable.csv',
+                   if_plot=True, wtps=None, nmb_file_name='NMBTable.csv'):
     """ performs cost-effectiveness and cost-benefit analyses
-    :param multi_cohort_outcomes_mono: outcomes of a multi-cohort simulated without screening
-    :param multi_cohort_outcomes_combo: outcomes of a multi-cohort simulated with biennial screening
+    :param multi_cohort_outcomes_no: outcomes of a multi-cohort simulated without screening
+    :param multi_cohort_outcomes_bi: outcomes of a multi-cohort simulated with biennial screening
+    :param race: race of the simulated patients (to show in the figure titles)
+    :param file_name: name of the csv file to store the CE table in
+    :param if_plot: set to True to draw the cost-effectiveness plane and the net monetary benefit figure
+        (otherwise only the CE table is reported)
+    :param wtps: (list) of willingness-to-pay values at which to report the acceptability, expected loss and
+        incremental net monetary benefit of each strategy (None to not report them)
+    :param nmb_file_name: name of the csv file to store the table of net monetary benefits in
     """
 
+    # text to add to the figure titles
+    race_text = '' if race is None else ' ({})'.format(race.name)
+
+    # report the CE table (calculated from the outcomes of cohorts so that it does not need EconEval,
+    # which loads the plotting modules)
+    write_CE_table(
+        sets_of_multi_cohort_outcomes=[multi_cohort_outcomes_no, multi_cohort_outcomes_bi],
+        strategy_names=['No Screening', 'Biennial Screening'],
+        file_name=file_name)
+
+    # report the net monetary benefits over the grid of willingness-to-pay values
+    if wtps is not None:
+        NetBenefit.get_net_benefit_curves(
+            sets_of_multi_cohort_outcomes=[multi_cohort_outcomes_no, multi_cohort_outcomes_bi],
+            wtps=wtps,
+            alpha=D.ALPHA,
+            strategy_names=['No Screening', 'Biennial Screening']).export_to_csv(file_name=nmb_file_name)
+
+    # the cost-effectiveness plane and the net monetary benefit figure
+    if not if_plot:
+        return
+
+    # plotting modules (and matplotlib) are imported only when a figure is requested
+    # so that batch runs that only need numbers do not pay for loading them
+    import SimPy.EconEval as Econ
+
     # define two strategies
     no_screening_strategy = Econ.Strategy(
         name='No Screening',
@@ -211,22 +275,13 @@ def report_CEA_CBA(multi_cohort_outcomes_no, multi_cohort_outcomes_bi):
 
     # show the cost-effectiveness plane
     CEA.plot_CE_plane(
-        title='Cost-Effectiveness Analysis (Hispanic)',
+        title='Cost-Effectiveness Analysis' + race_text,
         x_label='Additional Discounted QALY',
         y_label='Additional Discounted Cost',
         fig_size=(6, 5),
         add_clouds=True,
         transparency=0.2)
 
-    # report the CE table
-    CEA.build_CE_table(
-        interval_type='p',  # uncertainty (projection) interval
-        alpha=D.ALPHA,
-        cost_digits=0,
-        effect_digits=2,
-        icer_digits=2,
-        file_name='CETable.csv')
-
     # CBA
     NBA = Econ.CBA(
         strategies=[no_screening_strategy, biennial_screening_strategy],
@@ -235,10 +290,60 @@ def report_CEA_CBA(multi_cohort_outcomes_no, multi_cohort_outcomes_bi):
     )
     # show the net monetary benefit figure
     NBA.plot_incremental_nmbs(
-        title='Cost-Benefit Analysis',
+        title='Cost-Benefit Analysis' + race_text,
         x_label='Willingness-To-Pay for One Additional QALY ($)',
         y_label='Incremental Net Monetary Benefit ($)',
         interval_type='p',
         show_legend=True,
         figure_size=(6, 5),
-    )
\ No newline at end of file
+    )
+
+
+def write_CE_table(sets_of_multi_cohort_outcomes, strategy_names, file_name, alpha=D.ALPHA):
+    """ writes the cost-effectiveness table of strategies to a csv file (expected cost and QALY of each
+    strategy and their increase with respect to the first strategy, with uncertainty (projection) intervals,
+    and the incremental cost-effectiveness ratio)
+    :param sets_of_multi_cohort_outcomes: (list) of outcomes of simulated multi-cohorts whose cohorts are
+        paired by position (one for each strategy; the first is the reference strategy)
+    :param strategy_names: (list) of the names of strategies
+    :param file_name: name of the csv file
+    :param alpha: significance level of the uncertainty intervals
+    """
+
+    ref = sets_of_multi_cohort_outcomes[0]
+    rows = [['Strategy', 'Expected Cost', 'Expected QALY', 'Incremental Cost', 'Incremental QALY', 'ICER']]
+    for outcomes, name in zip(sets_of_multi_cohort_outcomes, strategy_names):
+        # expected cost and QALY
+        row = [name,
+               Stat.SummaryStat(name='Cost', data=outcomes.meanCosts).get_formatted_mean_and_interval(
+                   interval_type='p', alpha=alpha, deci=0, form=','),
+               Stat.SummaryStat(name='QALY', data=outcomes.meanQALYs).get_formatted_mean_and_interval(
+                   interval_type='p', alpha=alpha, deci=2)]
+
+        if outcomes is ref:
+            row.extend(['-', '-', '-'])
+        else:
+            # increase in cost and QALY (paired by cohort)
+            incremental_cost = Stat.DifferenceStatPaired(
+                name='Incremental cost', x=outcomes.meanCosts, y_ref=ref.meanCosts)
+            incremental_qaly = Stat.DifferenceStatPaired(
+                name='Incremental QALY', x=outcomes.meanQALYs, y_ref=ref.meanQALYs)
+            row.extend([incremental_cost.get_formatted_mean_and_interval(
+                            interval_type='p', alpha=alpha, deci=0, form=','),
+                        incremental_qaly.get_formatted_mean_and_interval(
+                            interval_type='p', alpha=alpha, deci=2)])
+
+            # incremental cost-effectiveness ratio (ratio of the expected increases)
+            mean_cost = np.mean(outcomes.meanCosts) - np.mean(ref.meanCosts)
+            mean_qaly = np.mean(outcomes.meanQALYs) - np.mean(ref.meanQALYs)
+            if mean_qaly > 0:
+                row.append('{:,.2f}'.format(mean_cost / mean_qaly))
+            elif mean_cost < 0:
+                row.append('Dominant')
+            else:
+                row.append('Dominated')
+
+        rows.append(row)
+
+    with open(file_name, 'w', newline='') as file:
+        csv.writer(file).writerows(rows)
@@ -0,0 +1,112 @@
+import numpy as np
+
+import InputData as D
+
+# maximum number of (cohort, strategy, wtp) net benefits held in memory at once
+_MAX_CHUNK_SIZE = 2**22
+
+
+class NetBenefitCurves:
+    """ cost-effectiveness acceptability curves, expected loss curves and incremental net monetary benefit
+    bands of several strategies over a grid of willingness-to-pay values, calculated from the paired
+    costs and QALYs of simulated cohorts """
+
+    def __init__(self, costs, qalys, wtps, alpha=D.ALPHA, strategy_names=None):
+        """
+        :param costs: (array) mean discounted cost of each cohort, indexed by (strategy, cohort)
+        :param qalys: (array) mean discounted QALY of each cohort, indexed by (strategy, cohort)
+        :param wtps: (array) willingness-to-pay values for one additional QALY
+        :param alpha: significance level of the percentile intervals of incremental net monetary benefits
+        :param strategy_names: (list) of the names of strategies (the first strategy is the reference
+            strategy of incremental net monetary benefits)
+        """
+
+        costs = np.asarray(costs, dtype=float)
+        qalys = np.asarray(qalys, dtype=float)
+        self.wtps = np.asarray(wtps, dtype=float)
+        self.strategyNames = strategy_names
+        n_strategies, n_cohorts = costs.shape
+        n_wtps = len(self.wtps)
+
+        # expected net monetary benefit of each strategy (net benefits are linear in wtp)
+        self.expectedNMBs = qalys.mean(axis=1)[:, None] * self.wtps - costs.mean(axis=1)[:, None]
+        # strategy with the highest expected net monetary benefit at each wtp value
+        self.optimalStrategies = self.expectedNMBs.argmax(axis=0)
+
+        self.ceacs = np.zeros((n_strategies, n_wtps))  # probability that each strategy is the most cost-effective
+        self.expectedLosses = np.zeros((n_strategies, n_wtps))  # expected loss of choosing each strategy
+        self.incrementalNMBs = np.zeros((n_strategies, n_wtps))  # mean incremental net monetary benefit
+        self.incrementalNMBIntervals = np.zeros((2, n_strategies, n_wtps))  # (lower, upper) percentile interval
+
+        # incremental costs and QALYs with respect to the reference strategy, indexed by (cohort, strategy)
+        incremental_costs = (costs - costs[0]).T
+        incremental_qalys = (qalys - qalys[0]).T
+
+        # net benefits are calculated for chunks of wtp values to limit memory use
+        chunk_size = max(1, _MAX_CHUNK_SIZE // (n_strategies * n_cohorts))
+        for start in range(0, n_wtps, chunk_size):
+            wtps = self.wtps[start:start + chunk_size]
+            chunk = slice(start, start + len(wtps))
+
+            # incremental net benefits indexed by (cohort, strategy, wtp); the reference strategy has 0 and
+            # the ranking of strategies within a cohort is the same as by net benefits
+            nmbs = incremental_qalys[:, :, None] * wtps - incremental_costs[:, :, None]
+
+            # probability that each strategy has the highest net benefit
+            best = nmbs.argmax(axis=1)
+            self.ceacs[:, chunk] = (best[:, None, :] == np.arange(n_strategies)[None, :, None]).mean(axis=0)
+
+            # expected loss of each strategy (shortfall from the highest net benefit of each cohort)
+            self.expectedLosses[:, chunk] = (nmbs.max(axis=1)[:, None, :] - nmbs).mean(axis=0)
+
+            # mean and percentile interval of incremental net benefits
+            self.incrementalNMBs[:, chunk] = nmbs.mean(axis=0)
+            self.incrementalNMBIntervals[:, :, chunk] = np.percentile(
+                nmbs, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+
+        # expected value of perfect information (the expected loss of the optimal strategy)
+        self.evpi = self.expectedLosses.min(axis=0)
+
+    def export_to_csv(self, file_name):
+        """ writes the curves of all strategies to a csv file (one row for each wtp value)
+        :param file_name: name of the csv file
+        """
+
+        names = self.strategyNames
+        if names is None:
+            names = ['Strategy {}'.format(i) for i in range(len(self.expectedNMBs))]
+
+        # columns of the table
+        header = ['WTP']
+        columns = [self.wtps]
+        for i, name in enumerate(names):
+            header.extend(['{}: {}'.format(name, column) for column in
+                           ('Expected NMB', 'Probability most cost-effective', 'Expected loss',
+                            'Incremental NMB', 'Incremental NMB lower', 'Incremental NMB upper')])
+            columns.extend([self.expectedNMBs[i], self.ceacs[i], self.expectedLosses[i], self.incrementalNMBs[i],
+                            self.incrementalNMBIntervals[0, i], self.incrementalNMBIntervals[1, i]])
+        header.append('EVPI')
+        columns.append(self.evpi)
+
+        np.savetxt(file_name, np.column_stack(columns), delimiter=',', header=','.join(header), comments='')
+
+
+def get_net_benefit_curves(sets_of_multi_cohort_outcomes, wtps, alpha=D.ALPHA, strategy_names=None):
+    """
+    :param sets_of_multi_cohort_outcomes: (list) of outcomes of simulated multi-cohorts whose cohorts are
+        paired by position (one for each strategy; the first is the reference strategy)
+    :param wtps: (array) willingness-to-pay values for one additional QALY
+    :param alpha: significance level of the percentile intervals of incremental net monetary benefits
+    :param strategy_names: (list) of the names of strategies
+    :return: NetBenefitCurves of the strategies
+    """
+
+    n_cohorts = [len(outcomes.meanCosts) for outcomes in sets_of_multi_cohort_outcomes]
+    if len(set(n_cohorts)) > 1:
+        raise ValueError('All multi-cohorts should have the same number of simulated cohorts.')
+
+    return NetBenefitCurves(costs=[outcomes.meanCosts for outcomes in sets_of_multi_cohort_outcomes],
+                            qalys=[outcomes.meanQALYs for outcomes in sets_of_multi_cohort_outcomes],
+                            wtps=wtps,
+                            alpha=alpha,
+                            strategy_names=strategy_names)
@@ -1,24 +1,21 @@
+import hashlib
+import inspect
+import os
+import pickle
 from enum import Enum
 import numpy as np
+import FileSupport
 import InputData as Data
+import Profiling
 from InputData import HealthStates
 import SimPy.Markov as Markov
 
 
-class Therapies(Enum):
-    """ no screening vs. biennial screening """
-    NO = 0
-    BI = 1
-
-
-class Races(Enum):
-    """ race of the patient (i.e., non-Hispanic Whites, non-Hispanic Black, non-Hispanic American Indian/Alaska
-     Native (AIAN), Hispanic, and non-Hispanic Asian/Pacific Islander (API))"""
-    White = 0
-    Black = 1
-    AIAN = 2
-    Hispanic = 3
-    API = 4
+# therapies (no screening vs. biennial screening) and races of the patient (i.e., non-Hispanic Whites,
+# non-Hispanic Black, non-Hispanic American Indian/Alaska Native (AIAN), Hispanic, and non-Hispanic
+# Asian/Pacific Islander (API)) in the order of the input data file (their values index the input arrays)
+Therapies = Enum('Therapies', [(name, i) for i, name in enumerate(Data.THERAPIES)], module=__name__)
+Races = Enum('Races', [(name, i) for i, name in enumerate(Data.RACES)], module=__name__)
 
 
 class Parameters:
@@ -39,63 +36,16 @@ class Parameters:
         else:
             self.annualTreatmentCost = Data.BI_COST
 
-        # transition rate matrix and annual states utilities
-        # transition probability matrix of the selected therapy
-        self.transRateMatrix = []
-        if self.race == Races.White:
-            self.annualStateUtilities = Data.ANNUAL_STATE_UTILITY_W
-            if therapy == Therapies.NO:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_no = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_N0_W)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_no)
-            if therapy == Therapies.BI:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_bi = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_BI_W)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_bi)
-
-        if self.race == Races.Black:
-            self.annualStateUtilities = Data.ANNUAL_STATE_UTILITY_B
-            if therapy == Therapies.NO:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_no = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_N0_B)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_no)
-            if therapy == Therapies.BI:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_bi = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_BI_B)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_bi)
-
-        if self.race == Races.AIAN:
-            self.annualStateUtilities = Data.ANNUAL_STATE_UTILITY_AIAN
-            if therapy == Therapies.NO:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_no = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_N0_AIAN)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_no)
-            if therapy == Therapies.BI:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_bi = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_BI_AIAN)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_bi)
-
-        if self.race == Races.Hispanic:
-            self.annualStateUtilities = Data.ANNUAL_STATE_UTILITY_H
-            if therapy == Therapies.NO:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_no = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_N0_H)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_no)
-            if therapy == Therapies.BI:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_bi = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_BI_H)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_bi)
-
-        if self.race == Races.API:
-            self.annualStateUtilities = Data.ANNUAL_STATE_UTILITY_API
-            if therapy == Therapies.NO:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_no = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_N0_API)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_no)
-            if therapy == Therapies.BI:
-                # calculate transition probabilities between breast cancer states
-                prob_matrix_bi = get_trans_prob_matrix(trans_matrix=Data.TRANS_MATRIX_BI_API)
-                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_bi)
+        # annual states utilities of the selected race
+        self.annualStateUtilities = Data.ANNUAL_STATE_UTILITIES[race.value].tolist()
+
+        # counts of transitions of the selected race and therapy
+        trans_matrix = Data.TRANS_COUNTS[race.value, therapy.value]
+        # transition rate matrix derived from the counts of transitions (cached)
+        self.transRateMatrix = get_trans_rate_matrix_from_counts(trans_matrix=trans_matrix)
+        # annual transition probability matrix (with background mortality added) for the cohort trace
+        self.transProbMatrix = get_annual_trans_prob_matrix(
+            trans_prob_matrix=get_trans_prob_matrix(trans_matrix=trans_matrix))
 
         # annual state costs
         self.annualStateCosts = Data.ANNUAL_STATE_COST
@@ -104,6 +54,69 @@ class Parameters:
         self.discountRate = Data.DISCOUNT
 
 
+# cache of transition rate matrices derived from matrices of transition counts
+# ((content of the count matrix, background mortality) -> read-only rate matrix)
+_RATE_MATRIX_CACHE = {}
+# hash of the code that derives rate matrices (calculated once per process)
+_rate_matrix_code_version = None
+
+
+def get_trans_rate_matrix_from_counts(trans_matrix):
+    """
+    :param trans_matrix: transition matrix containing counts of transitions between states
+    :return: (read-only array) transition rate matrix (with background mortality added and 0 on the diagonal);
+        results are cached in memory and, if InputData.CACHE_DIR is set, on disk, keyed on the content of
+        the count matrix and the background mortality (and, on disk, the code that derives rate matrices)
+        so that the cache is invalidated when these change
+    """
+
+    counts = np.asarray(trans_matrix, dtype=float)
+    key = (counts.shape, counts.tobytes(), float(Data.ANNUAL_PROB_BACKGROUND_MORT))
+
+    rate_matrix = _RATE_MATRIX_CACHE.get(key)
+    if rate_matrix is None:
+        file_name = None if Data.CACHE_DIR is None \
+            else os.path.join(Data.CACHE_DIR, 'rate-matrix-{}.pkl'.format(_get_rate_matrix_cache_key(key=key)))
+
+        if file_name is not None and os.path.exists(file_name):
+            # load the rate matrix calculated by a previous run or another process
+            with open(file_name, 'rb') as file:
+                rate_matrix = pickle.load(file)
+        else:
+            rate_matrix = get_trans_rate_matrix(
+                trans_prob_matrix=get_trans_prob_matrix(trans_matrix=counts))
+            # missing (diagonal) rates are 0
+            rate_matrix = np.array([[0 if rate is None else rate for rate in row] for row in rate_matrix],
+                                   dtype=float)
+            if file_name is not None:
+                FileSupport.write_file_atomically(file_name=file_name,
+                                                  write=lambda file: pickle.dump(rate_matrix, file))
+
+        # the cached matrix is shared by all callers, so it cannot be changed
+        rate_matrix.setflags(write=False)
+        _RATE_MATRIX_CACHE[key] = rate_matrix
+
+    return rate_matrix
+
+
+def _get_rate_matrix_cache_key(key):
+    """
+    :param key: key of a rate matrix in the in-memory cache
+    :return: (string) hash of the inputs and the code that determine the transition rate matrix
+    """
+
+    global _rate_matrix_code_version
+    if _rate_matrix_code_version is None:
+        # source of the conversion from transition probabilities to rates
+        source = inspect.getsource(get_trans_rate_matrix) + inspect.getsource(get_trans_prob_matrix) \
+            + inspect.getsource(Markov.discrete_to_continuous)
+        _rate_matrix_code_version = hashlib.sha1(source.encode()).hexdigest()
+
+    shape, counts, background_mort = key
+    content = repr((shape, background_mort, _rate_matrix_code_version)).encode() + counts
+    return hashlib.sha1(content).hexdigest()
+
+
 def get_trans_prob_matrix(trans_matrix):
     """
     :param trans_matrix: transition matrix containing counts of transitions between states
@@ -122,6 +135,49 @@ def get_trans_prob_matrix(trans_matrix):
 
     return trans_prob_matrix
 
+
+def get_trans_prob_matrices(trans_counts):
+    """
+    :param trans_counts: (array) counts of transitions between states indexed by (..., from_state, to_state),
+        for example Data.TRANS_COUNTS for all races and therapies
+    :return: (array) transition probabilities of the same shape
+    """
+    trans_counts = np.asarray(trans_counts, dtype=float)
+    return trans_counts / trans_counts.sum(axis=-1, keepdims=True)
+
+
+def get_annual_trans_prob_matrix(trans_prob_matrix, annual_prob_background_mort=None):
+    """
+    :param trans_prob_matrix: annual transition probabilities between breast cancer states
+        (one row for each state that is not death and one column for each state except natural death),
+        or an array of such matrices indexed by (..., from_state, to_state)
+    :param annual_prob_background_mort: annual probability of death from other causes
+        (if not provided, Data.ANNUAL_PROB_BACKGROUND_MORT is used)
+    :return: (array) annual transition probability matrix between all health states with background
+        mortality added (background mortality competes with the transitions between breast cancer states)
+    """
+
+    if annual_prob_background_mort is None:
+        annual_prob_background_mort = Data.ANNUAL_PROB_BACKGROUND_MORT
+
+    n_states = len(HealthStates)
+    probs = np.array(trans_prob_matrix, dtype=float)
+    n_rows, n_cols = probs.shape[-2:]
+    prob_matrix = np.zeros(probs.shape[:-2] + (n_states, n_states))
+
+    # transitions between breast cancer states among those who do not die of other causes
+    prob_matrix[..., :n_rows, :n_cols] = (1 - annual_prob_background_mort) * probs
+    # background mortality
+    prob_matrix[..., :n_rows, HealthStates.NATUAL_DEATH.value] = annual_prob_background_mort
+
+    # death states are absorbing
+    prob_matrix[..., HealthStates.CANCER_DEATH.value, HealthStates.CANCER_DEATH.value] = 1
+    prob_matrix[..., HealthStates.NATUAL_DEATH.value, HealthStates.NATUAL_DEATH.value] = 1
+
+    return prob_matrix
+
+
+@Profiling.profiled('rate matrix derivation')
 def get_trans_rate_matrix(trans_prob_matrix):
 
     # find the transition rate matrix
@@ -143,4 +199,36 @@ def get_trans_rate_matrix(trans_prob_matrix):
     return trans_rate_matrix
 
 
+@Profiling.profiled('rate matrix derivation')
+def get_trans_rate_matrices(trans_prob_matrices, annual_prob_background_mort=None):
+    """ calculates the transition rate matrices of many transition probability matrices at once
+    (as get_trans_rate_matrix does for one matrix)
+    :param trans_prob_matrices: (array) annual transition probabilities between breast cancer states
+        indexed by (..., from_state, to_state), for example for all parameter sets or all races and therapies
+    :param annual_prob_background_mort: annual probability of death from other causes
+        (if not provided, Data.ANNUAL_PROB_BACKGROUND_MORT is used)
+    :return: (array) transition rate matrices between all health states indexed by (..., from_state, to_state)
+        (diagonal elements are 0)
+    """
+
+    if annual_prob_background_mort is None:
+        annual_prob_background_mort = Data.ANNUAL_PROB_BACKGROUND_MORT
+
+    probs = np.asarray(trans_prob_matrices, dtype=float)
+    n_rows, n_cols = probs.shape[-2:]
+    n_states = len(HealthStates)
+
+    # probability of staying in each state
+    stay_probs = np.diagonal(probs[..., :n_rows], axis1=-2, axis2=-1)[..., None]
+
+    # rates between breast cancer states (0 out of states that are never left)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = np.where(stay_probs == 1, 0, -np.log(stay_probs) * probs / ((1 - stay_probs) * 1))
+
+    trans_rate_matrices = np.zeros(probs.shape[:-2] + (n_states, n_states))
+    trans_rate_matrices[..., :n_rows, :n_cols] = rates
+    trans_rate_matrices[..., np.arange(n_rows), np.arange(n_rows)] = 0
+    # add background mortality rate
+    trans_rate_matrices[..., :n_rows, HealthStates.NATUAL_DEATH.value] = -np.log(1 - annual_prob_background_mort)
 
+    return trans_rate_matrices
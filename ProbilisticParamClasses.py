@@ -1,9 +1,20 @@
 import math
+import warnings
+from enum import Enum
 import scipy.stats as stat
+from scipy.stats import qmc
+import Profiling
 import SimPy.RandomVariateGenerators as RVGs
 from ParameterClasses import *  # import everything from the ParameterClass module
 
 
+class SamplingMethods(Enum):
+    """ methods to draw parameter sets for probabilistic sensitivity analysis """
+    RANDOM = 0              # independent pseudo-random draws
+    LATIN_HYPERCUBE = 1     # Latin hypercube design across the draws
+    SOBOL = 2               # scrambled Sobol sequence across the draws
+
+
 class Parameters:
     """ class to include parameter information to simulate the model """
 
@@ -14,6 +25,7 @@ class Parameters:
         self.initialHealthState = HealthStates.WELL     # initial health state
         self.annualTreatmentCost = 0        # annual treatment cost
         self.transRateMatrix = []                # transition probability matrix of the selected therapy
+        self.transProbMatrix = []           # annual transition probability matrix (for the cohort trace)
         self.annualStateCosts = []          # annual state costs
         self.annualStateUtilities = []      # annual state utilities at the first year
         self.discountRate = Data.DISCOUNT   # discount rate
@@ -36,93 +48,35 @@ class ParameterGenerator:
         else:
             self.annualTreatmentCost = Data.NO_COST + Data.BI_COST
 
-        # create Dirichlet distributions for transition probabilities
-        j = 0
-        if self.race == Races.White:
-            if self.therapy == Therapies.NO:
-                for probs in Data.TRANS_MATRIX_N0_W:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-            else:
-                for probs in Data.TRANS_MATRIX_BI_W:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-
-        elif self.race == Races.Black:
-            if self.therapy == Therapies.NO:
-                for probs in Data.TRANS_MATRIX_N0_B:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-            else:
-                for probs in Data.TRANS_MATRIX_BI_B:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-
-        elif self.race == Races.AIAN:
-            if self.therapy == Therapies.NO:
-                for probs in Data.TRANS_MATRIX_N0_AIAN:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-            else:
-                for probs in Data.TRANS_MATRIX_BI_AIAN:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-
-        elif self.race == Races.Hispanic:
-            if self.therapy == Therapies.NO:
-                for probs in Data.TRANS_MATRIX_N0_H:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-            else:
-                for probs in Data.TRANS_MATRIX_BI_H:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-
-        else:
-            if self.therapy == Therapies.NO:
-                for probs in Data.TRANS_MATRIX_N0_API:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
-            else:
-                for probs in Data.TRANS_MATRIX_BI_API:
-                    self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
-                    j += 1
+        # matrix of transition counts of the selected race and therapy
+        self.transCounts = Data.TRANS_COUNTS[self.race.value, self.therapy.value]
 
+        # create Dirichlet distributions for transition probabilities
+        for probs in self.transCounts:
+            self.probMatrixRVG.append(RVGs.Dirichlet(a=probs, if_ignore_0s=True))
 
         # create normal distributions for annual state cost
         for cost in Data.ANNUAL_STATE_COST[1:3]:
             self.annualStateCostRVG.append(RVGs.Normal(loc=cost, scale=cost/4))
 
-        # create uniform distributions for annual state utility
-        if self.race == Races.White:
-            for utility in Data.ANNUAL_STATE_UTILITY_W:
-                self.annualStateUtilityRVG.append(RVGs.Uniform(scale=utility, loc=0.5*utility))
-
-        elif self.race == Races.Black:
-            for utility in Data.ANNUAL_STATE_UTILITY_W:
-                self.annualStateUtilityRVG.append(RVGs.Uniform(scale=utility, loc=0.5*utility))
-
-        elif self.race == Races.Hispanic:
-            for utility in Data.ANNUAL_STATE_UTILITY_W:
-                self.annualStateUtilityRVG.append(RVGs.Uniform(scale=utility, loc=0.5*utility))
-
-        elif self.race == Races.AIAN:
-            for utility in Data.ANNUAL_STATE_UTILITY_W:
-                self.annualStateUtilityRVG.append(RVGs.Uniform(scale=utility, loc=0.5*utility))
-
-        else:
-            for utility in Data.ANNUAL_STATE_UTILITY_W:
-                self.annualStateUtilityRVG.append(RVGs.Uniform(scale=utility, loc=0.5*utility))
-
+        # create uniform distributions for annual state utility of the selected race
+        for utility in Data.ANNUAL_STATE_UTILITIES[self.race.value]:
+            self.annualStateUtilityRVG.append(RVGs.Uniform(scale=utility, loc=0.5*utility))
 
+    @Profiling.profiled('parameter sampling')
     def get_new_parameters(self, rng):
         """
         :param rng: random number generator
         :return: a new parameter set
         """
 
-        # create a parameter set
-        param = Parameters(therapy=self.therapy, race=self.race)
+        # separate random number streams for each row of transition probabilities, for state costs and
+        # for state utilities, so that the same rng gives the same random numbers to each input
+        # regardless of the values sampled for the other inputs (common random numbers across therapies)
+        seeds = rng.randint(low=0, high=2**31 - 1, size=len(self.probMatrixRVG) + 2)
+        prob_rngs = [np.random.RandomState(seed=seed) for seed in seeds[:-2]]
+        cost_rng = np.random.RandomState(seed=seeds[-2])
+        utility_rng = np.random.RandomState(seed=seeds[-1])
 
         # calculate transition probabilities
         prob_matrix = []  # probability matrix without background mortality added
@@ -132,16 +86,13 @@ class ParameterGenerator:
             if s not in [HealthStates.CANCER_DEATH, HealthStates.NATUAL_DEATH]:
                 # sample from the dirichlet distribution to find the transition probabilities between breast cancer states
                 # fill in the transition probabilities out of this state
-                prob_matrix.append(self.probMatrixRVG[s.value].sample(rng))
-
-        # calculate transition rate between breast cancer states
-        param.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix)
+                prob_matrix.append(self.probMatrixRVG[s.value].sample(prob_rngs[s.value]))
 
         # sample from normal distributions that are assumed for annual state costs
-        param.annualStateCosts = [0]
+        annual_state_costs = [0]
         for dist in self.annualStateCostRVG:
             cost = dist.loc
-            fit_cost = dist.sample(rng)
+            fit_cost = dist.sample(cost_rng)
             if fit_cost < 0.5 * cost:
                 new_cost = 0.5 * cost
             elif fit_cost > 1.5 * cost:
@@ -149,22 +100,159 @@ class ParameterGenerator:
             else:
                 new_cost = fit_cost
             # append the distribution
-            param.annualStateCosts.append(new_cost)
-        param.annualStateCosts.append(0)
-        param.annualStateCosts.append(0)
+            annual_state_costs.append(new_cost)
+        annual_state_costs.append(0)
+        annual_state_costs.append(0)
 
         # sample from uniform distributions that are assumed for annual state utilities
+        annual_state_utilities = []
         for dist in self.annualStateUtilityRVG:
             utility = dist.loc
-            fit_utility =dist.sample(rng)
+            fit_utility =dist.sample(utility_rng)
             if fit_utility < 0.5 * utility:
                 new_utility = 0.5 * utility
             elif fit_utility > min(1, 1.5 * utility):
                 new_utility = min(1, 1.5 * utility)
             else:
                 new_utility = fit_utility
-            param.annualStateUtilities.append(new_utility)
-
+            annual_state_utilities.append(new_utility)
 
         # return the parameter set
+        return self.__get_parameters(prob_matrix=prob_matrix,
+                                     annual_state_costs=annual_state_costs,
+                                     annual_state_utilities=annual_state_utilities)
+
+    @Profiling.profiled('parameter sampling')
+    def get_new_parameter_arrays(self, n, rng, sampling=SamplingMethods.RANDOM):
+        """ draws n parameter sets at once
+        :param n: number of parameter sets
+        :param rng: random number generator
+        :param sampling: (SamplingMethods) method to draw the parameter sets
+        :return: (probs, costs, utilities) where probs is an (n, 4, 5) array of transition probabilities
+            between breast cancer states (without background mortality), and costs and utilities are
+            (n, number of health states) arrays of annual state costs and annual state utilities
+        """
+
+        if sampling != SamplingMethods.RANDOM:
+            return self.__get_parameter_arrays_from_design(n=n, rng=rng, sampling=sampling)
+
+        # separate random number streams (as in get_new_parameters)
+        n_rows = len(self.transCounts)
+        seeds = rng.randint(low=0, high=2**31 - 1, size=n_rows + 2)
+        cost_rng = np.random.RandomState(seed=seeds[-2])
+        utility_rng = np.random.RandomState(seed=seeds[-1])
+
+        # sample transition probabilities from dirichlet distributions (ignoring 0 counts)
+        probs = np.zeros((n, ) + self.transCounts.shape)
+        for i, counts in enumerate(self.transCounts):
+            idx = np.flatnonzero(counts > 0)
+            probs[:, i, idx] = np.random.RandomState(seed=seeds[i]).dirichlet(counts[idx], size=n)
+
+        # sample annual state costs from normal distributions and truncate to [0.5, 1.5] x mean
+        costs = np.zeros((n, len(HealthStates)))
+        for i, dist in enumerate(self.annualStateCostRVG):
+            costs[:, i + 1] = np.clip(cost_rng.normal(loc=dist.loc, scale=dist.scale, size=n),
+                                      0.5 * dist.loc, 1.5 * dist.loc)
+
+        # sample annual state utilities from uniform distributions and truncate as in get_new_parameters
+        utilities = np.zeros((n, len(HealthStates)))
+        for i, dist in enumerate(self.annualStateUtilityRVG):
+            utilities[:, i] = np.clip(utility_rng.uniform(low=dist.loc, high=dist.loc + dist.scale, size=n),
+                                      0.5 * dist.loc, min(1, 1.5 * dist.loc))
+
+        return probs, costs, utilities
+
+    def __get_parameter_arrays_from_design(self, n, rng, sampling):
+        """ draws n parameter sets at once from a Latin hypercube or Sobol design over all inputs;
+        each point of the design is mapped to parameter values through the inverse cumulative distribution
+        functions of the distributions of inputs (the probabilities of a row of the transition matrix are
+        normalized gamma variates, which follow the dirichlet distribution of the row)
+        :param n: number of parameter sets
+        :param rng: random number generator
+        :param sampling: (SamplingMethods) design to draw the parameter sets from
+        :return: (probs, costs, utilities) as returned by get_new_parameter_arrays
+        """
+
+        # one input for each non-zero count of each row of transition counts, each state cost and each state utility
+        nonzero_idx = [np.flatnonzero(counts > 0) for counts in self.transCounts]
+        n_inputs = sum(len(idx) for idx in nonzero_idx) + len(self.annualStateCostRVG) \
+            + len(self.annualStateUtilityRVG)
+
+        # points of the design in the unit hypercube (one row for each parameter set)
+        seed = rng.randint(low=0, high=2**31 - 1)
+        if sampling == SamplingMethods.SOBOL:
+            # Sobol designs keep their balance properties only for a power-of-two number of points
+            m = max(0, math.ceil(math.log2(n)))
+            if n != 2 ** m:
+                warnings.warn('A Sobol design of {} parameter sets is not balanced; the first {} points of a '
+                              'design of {} points are used (use a power of two, such as {}, for the number '
+                              'of cohorts).'.format(n, n, 2 ** m, 2 ** m), stacklevel=2)
+            design = qmc.Sobol(d=n_inputs, scramble=True, seed=seed).random_base2(m)[:n]
+        else:
+            design = qmc.LatinHypercube(d=n_inputs, seed=seed).random(n)
+        # keep points away from the bounds where inverse cumulative distribution functions are infinite
+        design = np.clip(design, 1e-12, 1 - 1e-12)
+        columns = iter(design.T)
+
+        # transition probabilities from normalized gamma variates
+        probs = np.zeros((n, ) + self.transCounts.shape)
+        for i, idx in enumerate(nonzero_idx):
+            gammas = np.array([stat.gamma.ppf(next(columns), a=a) for a in self.transCounts[i, idx]]).T
+            probs[:, i, idx] = gammas / gammas.sum(axis=1, keepdims=True)
+
+        # annual state costs from normal distributions truncated to [0.5, 1.5] x mean
+        costs = np.zeros((n, len(HealthStates)))
+        for i, dist in enumerate(self.annualStateCostRVG):
+            costs[:, i + 1] = np.clip(stat.norm.ppf(next(columns), loc=dist.loc, scale=dist.scale),
+                                      0.5 * dist.loc, 1.5 * dist.loc)
+
+        # annual state utilities from uniform distributions truncated as in get_new_parameters
+        utilities = np.zeros((n, len(HealthStates)))
+        for i, dist in enumerate(self.annualStateUtilityRVG):
+            utilities[:, i] = np.clip(dist.loc + dist.scale * next(columns),
+                                      0.5 * dist.loc, min(1, 1.5 * dist.loc))
+
+        return probs, costs, utilities
+
+    def get_new_parameter_sets(self, n, rng, sampling=SamplingMethods.RANDOM):
+        """
+        :param n: number of parameter sets
+        :param rng: random number generator
+        :param sampling: (SamplingMethods) method to draw the parameter sets
+        :return: (list) of n new parameter sets drawn at once by get_new_parameter_arrays
+        """
+
+        probs, costs, utilities = self.get_new_parameter_arrays(n=n, rng=rng, sampling=sampling)
+
+        # transition rate matrices and annual transition probability matrices of all parameter sets
+        rate_matrices = get_trans_rate_matrices(trans_prob_matrices=probs)
+        annual_prob_matrices = get_annual_trans_prob_matrix(trans_prob_matrix=probs)
+
+        param_sets = []
+        for i in range(n):
+            param = Parameters(therapy=self.therapy, race=self.race)
+            param.transRateMatrix = rate_matrices[i]
+            param.transProbMatrix = annual_prob_matrices[i]
+            param.annualStateCosts = costs[i].tolist()
+            param.annualStateUtilities = utilities[i].tolist()
+            param_sets.append(param)
+        return param_sets
+
+    def __get_parameters(self, prob_matrix, annual_state_costs, annual_state_utilities):
+        """
+        :param prob_matrix: transition probabilities between breast cancer states
+        :param annual_state_costs: (list) annual cost of each health state
+        :param annual_state_utilities: (list) annual utility of each health state
+        :return: a parameter set
+        """
+
+        param = Parameters(therapy=self.therapy, race=self.race)
+
+        # calculate transition rate between breast cancer states
+        param.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix)
+        # annual transition probabilities with background mortality added
+        param.transProbMatrix = get_annual_trans_prob_matrix(trans_prob_matrix=prob_matrix)
+        param.annualStateCosts = annual_state_costs
+        param.annualStateUtilities = annual_state_utilities
+
         return param
@@ -0,0 +1,135 @@
+import functools
+import time
+
+# time and number of calls of each phase
+# (name of phase -> [total seconds, seconds not spent in nested phases, number of calls])
+_timings = {}
+# spans that are open (the last one is the innermost)
+_open_spans = []
+# if timings are recorded
+_enabled = False
+
+
+class _Span:
+    """ records the time spent in a phase of the simulation """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self.nestedSeconds = 0  # time spent in phases nested in this phase
+
+    def __enter__(self):
+        _open_spans.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        _open_spans.pop()
+        if len(_open_spans) > 0:
+            _open_spans[-1].nestedSeconds += seconds
+
+        timing = _timings.get(self.name)
+        if timing is None:
+            timing = _timings[self.name] = [0.0, 0.0, 0]
+        timing[0] += seconds
+        timing[1] += seconds - self.nestedSeconds
+        timing[2] += 1
+        return False
+
+
+class _NullSpan:
+    """ does nothing (used while profiling is disabled) """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable():
+    """ starts recording the time spent in each phase """
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """ stops recording the time spent in each phase (recorded timings are kept) """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    """
+    :return: True if timings are being recorded
+    """
+    return _enabled
+
+
+def reset():
+    """ removes the recorded timings """
+    _timings.clear()
+
+
+def span(name):
+    """
+    :param name: name of a phase of the simulation
+    :return: a context manager that records the time spent in the phase (when profiling is enabled)
+    """
+    if _enabled:
+        return _Span(name)
+    return _NULL_SPAN
+
+
+def profiled(name):
+    """
+    :param name: name of a phase of the simulation
+    :return: a decorator that records the time spent in the decorated function as this phase
+        (when profiling is enabled)
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def get_timings():
+    """
+    :return: (dictionary) of recorded timings
+        (name of phase -> (total seconds, seconds not spent in nested phases, number of calls))
+    """
+    return {name: tuple(timing) for name, timing in _timings.items()}
+
+
+def add_timings(timings):
+    """ adds timings recorded elsewhere (for example, in a worker process) to the recorded timings
+    :param timings: (dictionary) returned by get_timings
+    """
+    for name, (seconds, self_seconds, n_calls) in timings.items():
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = [0.0, 0.0, 0]
+        timing[0] += seconds
+        timing[1] += self_seconds
+        timing[2] += n_calls
+
+
+def print_report():
+    """ prints, for each phase, the total time (including nested phases), the time not spent in
+    nested phases, the number of calls and the time per call (sorted by the time not spent in nested phases) """
+
+    print('{:<32} {:>11} {:>11} {:>10} {:>14}'.format('Phase', 'Total (s)', 'Self (s)', 'Calls', 'Per call (ms)'))
+    for name, (seconds, self_seconds, n_calls) in sorted(get_timings().items(), key=lambda item: -item[1][1]):
+        print('{:<32} {:>11.3f} {:>11.3f} {:>10d} {:>14.4f}'.format(
+            name, seconds, self_seconds, n_calls, 1000 * seconds / n_calls))
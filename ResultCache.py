@@ -0,0 +1,150 @@
+import hashlib
+import os
+import pickle
+import numpy as np
+
+import FileSupport
+import InputData as Data
+
+# settings in InputData that do not change simulation outcomes
+_SETTINGS_NOT_HASHED = ('CACHE_DIR', 'RESULT_CACHE_DIR', 'RESULT_CACHE_MAX_SIZE')
+# source files that determine simulation outcomes
+_SOURCE_FILES = ('InputData.py', 'InputData.json', 'ParameterClasses.py', 'ProbilisticParamClasses.py',
+                 'MarkovModelClasses.py', 'MultiCohortClasses.py')
+# hash of the source files (calculated once per process)
+_code_version = None
+
+
+def get_cache_key(multi_cohort, sim_length):
+    """
+    :param multi_cohort: a multi-cohort that is not simulated yet
+    :param sim_length: simulation length
+    :return: (string) hash of everything the outcomes of this multi-cohort depend on
+    """
+
+    content = repr((_get_input_data(),
+                    multi_cohort.race.name,
+                    multi_cohort.therapy.name,
+                    [int(i) for i in multi_cohort.ids],
+                    multi_cohort.popSize,
+                    float(sim_length),
+                    multi_cohort.engine.name,
+                    multi_cohort.paramSeed,
+                    multi_cohort.sampling.name,
+                    get_code_version()))
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def get_code_version():
+    """
+    :return: (string) hash of the source files that determine simulation outcomes
+    """
+
+    global _code_version
+    if _code_version is None:
+        sha = hashlib.sha1()
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for file_name in _SOURCE_FILES:
+            with open(os.path.join(folder, file_name), 'rb') as file:
+                sha.update(file.read())
+        _code_version = sha.hexdigest()
+    return _code_version
+
+
+def get_input_data_version():
+    """
+    :return: (string) hash of the input tables and settings in InputData that determine simulation outcomes
+    """
+    return hashlib.sha1(repr(_get_input_data()).encode()).hexdigest()
+
+
+def load(key):
+    """
+    :param key: cache key returned by get_cache_key
+    :return: the stored multi-cohort outcomes (None if not in the cache)
+    """
+
+    if Data.RESULT_CACHE_DIR is None:
+        return None
+
+    file_name = _get_file_name(key)
+    try:
+        with open(file_name, 'rb') as file:
+            outcomes = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+    # mark this entry as recently used (another process may have evicted it since it was read)
+    try:
+        os.utime(file_name)
+    except OSError:
+        pass
+    return outcomes
+
+
+def store(key, multi_cohort_outcomes):
+    """ stores the outcomes of a simulated multi-cohort and evicts the least recently used entries
+    if the cache is larger than RESULT_CACHE_MAX_SIZE
+    :param key: cache key returned by get_cache_key
+    :param multi_cohort_outcomes: outcomes of the simulated multi-cohort
+    """
+
+    if Data.RESULT_CACHE_DIR is None:
+        return
+
+    FileSupport.write_file_atomically(file_name=_get_file_name(key),
+                                      write=lambda file: pickle.dump(multi_cohort_outcomes, file))
+
+    _evict(max_size=Data.RESULT_CACHE_MAX_SIZE)
+
+
+def _evict(max_size):
+    """ removes the least recently used entries until the total size of the cache is at most max_size
+    :param max_size: maximum total size of the cache (bytes)
+    """
+
+    # cache entries (time of last use, size, file name)
+    entries = []
+    for name in os.listdir(Data.RESULT_CACHE_DIR):
+        if name.startswith('outcomes-') and name.endswith('.pkl'):
+            file_name = os.path.join(Data.RESULT_CACHE_DIR, name)
+            try:
+                info = os.stat(file_name)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, file_name))
+
+    # remove the oldest entries first
+    total_size = sum(entry[1] for entry in entries)
+    for last_used, size, file_name in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
+        total_size -= size
+
+
+def _get_input_data():
+    """
+    :return: (list) of the names and values of input tables and settings in InputData
+    """
+
+    data = []
+    for name in sorted(vars(Data)):
+        value = getattr(Data, name)
+        if name.isupper() and name not in _SETTINGS_NOT_HASHED:
+            # arrays are hashed by their full content (their repr may be abbreviated)
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
+            data.append((name, value))
+    return data
+
+
+def _get_file_name(key):
+    """
+    :param key: cache key
+    :return: name of the cache file of this key
+    """
+    return os.path.join(Data.RESULT_CACHE_DIR, 'outcomes-{}.pkl'.format(key))
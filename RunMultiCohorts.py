@@ -1,96 +1,42 @@
 import InputData as D
-import MultiCohortClasses as Cls
-import MultiCohortSupport as Support
 import ProbilisticParamClasses as P
-import SimPy.Plots.Histogram as Hist
-import SimPy.Plots.SamplePaths as Path
+import ScenarioGrid as Grid
 
 N_COHORTS = 200              # number of cohorts
 therapy = P.Therapies.NO  # selected therapy
-race = P.Races.White
-
-# create multiple cohort
-multiCohortW = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=D.POP_SIZE,
-    therapy=therapy,
-    race=P.Races.White)
-
-multiCohortW.simulate(sim_length=10)
-
-# # plot the sample paths
-# Path.plot_sample_paths(
-#     sample_paths=multiCohort.multiCohortOutcomes.survivalCurves,
-#     title='Survival Curves',
-#     x_label='Time-Step (Year)',
-#     y_label='Number Survived',
-#     transparency=0.5)
-#
-# # plot the histogram of average survival time
-# Hist.plot_histogram(
-#     data=multiCohort.multiCohortOutcomes.meanSurvivalTimes,
-#     title='Histogram of Mean Survival Time',
-#     x_label='Mean Survival Time (Year)',
-#     y_label='Count')
-#
-# Hist.plot_histogram(
-#     data=multiCohort.multiCohortOutcomes.meanSurvivalTimes,
-#     title='Histogram of Mean Survival Time',
-#     x_label='Mean Survival Time (Year)',
-#     y_label='Count')
-
-# print the outcomes of this simulated cohort
-Support.print_outcomes(multi_cohort_outcomes=multiCohortW.multiCohortOutcomes,
-                       therapy_name=therapy, race=P.Races.White)
-
-# create multiple cohort
-multiCohortB = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=D.POP_SIZE,
-    therapy=therapy,
-    race=P.Races.Black)
-
-multiCohortB.simulate(sim_length=10)
-
-# print the outcomes of this simulated cohort
-Support.print_outcomes(multi_cohort_outcomes=multiCohortB.multiCohortOutcomes,
-                       therapy_name=therapy, race=P.Races.Black)
-
-# create multiple cohort
-multiCohortAIAN = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=D.POP_SIZE,
-    therapy=therapy,
-    race=P.Races.AIAN)
-
-multiCohortAIAN.simulate(sim_length=10)
-
-# print the outcomes of this simulated cohort
-Support.print_outcomes(multi_cohort_outcomes=multiCohortAIAN.multiCohortOutcomes,
-                       therapy_name=therapy, race=P.Races.AIAN)
-
-# create multiple cohort
-multiCohortH = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=D.POP_SIZE,
-    therapy=therapy,
-    race=P.Races.Hispanic)
-
-multiCohortH.simulate(sim_length=10)
-
-# print the outcomes of this simulated cohort
-Support.print_outcomes(multi_cohort_outcomes=multiCohortH.multiCohortOutcomes,
-                       therapy_name=therapy, race=P.Races.Hispanic)
-
-# create multiple cohort
-multiCohortAPI = Cls.MultiCohort(
-    ids=range(N_COHORTS),
-    pop_size=D.POP_SIZE,
-    therapy=therapy,
-    race=P.Races.API)
-
-multiCohortAPI.simulate(sim_length=10)
-
-# print the outcomes of this simulated cohort
-Support.print_outcomes(multi_cohort_outcomes=multiCohortAPI.multiCohortOutcomes,
-                       therapy_name=therapy, race=P.Races.API)
+races = list(P.Races)     # races to simulate
+IF_PLOT = True            # set to False to report only numbers (without loading plotting modules)
+
+if __name__ == '__main__':
+
+    # create multiple cohorts for each race
+    scenarios = Grid.get_scenario_grid(races=races,
+                                       therapies=[therapy],
+                                       n_cohorts=N_COHORTS,
+                                       pop_size=D.POP_SIZE,
+                                       sim_length=10)
+
+    # simulate all races concurrently
+    multiCohorts = Grid.simulate_scenarios(scenarios=scenarios)
+
+    # # plot the survival curves
+    # import MultiCohortSupport as Support
+    # Support.plot_survival_curves(
+    #     sets_of_multi_cohort_outcomes=[multiCohorts[0].multiCohortOutcomes],
+    #     title='Survival Curves',
+    #     x_label='Time-Step (Year)',
+    #     y_label='Number Survived',
+    #     legends=[therapy],
+    #     color_codes=['green'],
+    #     transparency=0.5)
+    #
+    # # plot the histogram of average survival time
+    # import SimPy.Plots.Histogram as Hist
+    # Hist.plot_histogram(
+    #     data=multiCohorts[0].multiCohortOutcomes.meanSurvivalTimes,
+    #     title='Histogram of Mean Survival Time',
+    #     x_label='Mean Survival Time (Year)',
+    #     y_label='Count')
+
+    # print the outcomes of the simulated cohorts of each race
+    Grid.report_scenarios(multi_cohorts=multiCohorts, if_plot=IF_PLOT)
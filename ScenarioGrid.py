@@ -0,0 +1,150 @@
+import os
+import MultiCohortClasses as Cls
+import MultiCohortSupport as Support
+from MarkovModelClasses import CohortEngines
+from ParameterClasses import Therapies, Races
+from ProbilisticParamClasses import SamplingMethods
+
+
+class Scenario:
+    """ a race x therapy arm to simulate with a multi-cohort """
+
+    def __init__(self, race, therapy, n_cohorts, pop_size, sim_length, ids=None,
+                 if_common_random_numbers=False):
+        """
+        :param race: race of the patients
+        :param therapy: selected therapy
+        :param n_cohorts: number of cohorts to simulate
+        :param pop_size: population size of cohorts to simulate
+        :param sim_length: simulation length
+        :param ids: (list) of ids for cohorts to simulate; if not provided, cohorts of the
+            no screening arm get ids [0, n_cohorts) and cohorts of the biennial screening arm
+            get ids [n_cohorts, 2*n_cohorts)
+        :param if_common_random_numbers: set to True to give cohorts of every therapy the ids [0, n_cohorts)
+            (if ids are not provided), so that matched cohorts of the two arms use the same patient-level
+            and parameter-level random number streams
+        """
+        self.race = race
+        self.therapy = therapy
+        self.nCohorts = n_cohorts
+        self.popSize = pop_size
+        self.simLength = sim_length
+        if ids is None:
+            if if_common_random_numbers:
+                ids = range(n_cohorts)
+            else:
+                ids = range(therapy.value * n_cohorts, (therapy.value + 1) * n_cohorts)
+        self.ids = ids
+
+
+def get_scenario_grid(races, therapies, n_cohorts, pop_size, sim_length, if_common_random_numbers=False):
+    """
+    :param races: (list) of races to simulate
+    :param therapies: (list) of therapies to simulate for each race
+    :param n_cohorts: number of cohorts to simulate in each arm
+    :param pop_size: population size of cohorts to simulate
+    :param sim_length: simulation length
+    :param if_common_random_numbers: set to True to use common random numbers across therapies
+    :return: (list) of scenarios for all combinations of races and therapies
+    """
+
+    scenarios = []
+    for race in races:
+        for therapy in therapies:
+            scenarios.append(Scenario(race=race,
+                                      therapy=therapy,
+                                      n_cohorts=n_cohorts,
+                                      pop_size=pop_size,
+                                      sim_length=sim_length,
+                                      if_common_random_numbers=if_common_random_numbers))
+    return scenarios
+
+
+def simulate_scenarios(scenarios, n_workers=None, engine=CohortEngines.PATIENT, checkpoint_dir=None,
+                       sampling=SamplingMethods.RANDOM, event_log_dir=None):
+    """ simulates all scenarios; cohorts of all scenarios are scheduled together over the worker processes
+    :param scenarios: (list) of scenarios to simulate
+    :param n_workers: number of processes to simulate cohorts in parallel
+            (1 to simulate cohorts serially, None to use all available cores)
+    :param engine: (CohortEngines) method to simulate each cohort
+    :param checkpoint_dir: if provided, the outcomes of each simulated cohort are written to a subdirectory
+        of this directory for each scenario, so that an interrupted run can be resumed or a finished
+        run can be extended with more cohorts
+    :param sampling: (SamplingMethods) method to draw the parameter sets of cohorts
+    :param event_log_dir: if provided, the events of the patients of each simulated cohort are written to
+        a subdirectory of this directory for each scenario
+    :return: (list) of simulated multi-cohorts (one for each scenario in the same order)
+    """
+
+    # create a multi-cohort for each scenario
+    multi_cohorts = []
+    for scenario in scenarios:
+        scenario_name = '{}-{}'.format(scenario.race.name, scenario.therapy.name)
+        if checkpoint_dir is None:
+            scenario_checkpoint_dir = None
+        else:
+            scenario_checkpoint_dir = os.path.join(checkpoint_dir, scenario_name)
+        if event_log_dir is None:
+            scenario_event_log_dir = None
+        else:
+            scenario_event_log_dir = os.path.join(event_log_dir, scenario_name)
+        multi_cohorts.append(Cls.MultiCohort(ids=scenario.ids,
+                                             pop_size=scenario.popSize,
+                                             therapy=scenario.therapy,
+                                             race=scenario.race,
+                                             engine=engine,
+                                             checkpoint_dir=scenario_checkpoint_dir,
+                                             sampling=sampling,
+                                             event_log_dir=scenario_event_log_dir))
+
+    # simulate cohorts of all scenarios together
+    Cls.simulate_multi_cohorts(multi_cohorts=multi_cohorts,
+                               sim_length=[scenario.simLength for scenario in scenarios],
+                               n_workers=n_workers)
+
+    return multi_cohorts
+
+
+def report_scenarios(multi_cohorts, if_plot=True, wtps=None):
+    """ prints the outcomes of each simulated arm and, for each race with both arms simulated,
+    the comparative outcomes and the cost-effectiveness and cost-benefit analyses
+    :param multi_cohorts: (list) of simulated multi-cohorts
+    :param if_plot: set to True to draw survival curves, histograms and the CEA and CBA figures
+        (otherwise only numbers and CE tables are reported and no plotting module is imported)
+    :param wtps: (list) of willingness-to-pay values at which to report the acceptability, expected loss and
+        incremental net monetary benefit of screening for each race (None to not report them)
+    """
+
+    for race in Races:
+        # simulated arms of this race
+        arms = {}
+        for multi_cohort in multi_cohorts:
+            if multi_cohort.race == race:
+                arms[multi_cohort.therapy] = multi_cohort.multiCohortOutcomes
+                # print the estimates for the mean survival time and number of invasive cancer and cancer death
+                Support.print_outcomes(multi_cohort_outcomes=multi_cohort.multiCohortOutcomes,
+                                       therapy_name=multi_cohort.therapy,
+                                       race=race)
+
+        if Therapies.NO not in arms or Therapies.BI not in arms:
+            continue
+
+        # draw survival curves and histograms
+        if if_plot:
+            Support.plot_survival_curves_and_histograms(multi_cohort_outcomes_no=arms[Therapies.NO],
+                                                        multi_cohort_outcomes_bi=arms[Therapies.BI])
+
+        # print comparative outcomes
+        print('Comparative outcomes (', race, ')')
+        Support.print_comparative_outcomes(multi_cohort_outcomes_no=arms[Therapies.NO],
+                                           multi_cohort_outcomes_bi=arms[Therapies.BI])
+        print('')
+
+        # report the CEA results
+        Support.report_CEA_CBA(multi_cohort_outcomes_no=arms[Therapies.NO],
+                               multi_cohort_outcomes_bi=arms[Therapies.BI],
+                               race=race,
+                               file_name='CETable-{}.csv'.format(race.name),
+                               if_plot=if_plot,
+                               wtps=wtps,
+                               nmb_file_name='NMBTable-{}.csv'.format(race.name))
@@ -0,0 +1,329 @@
+from enum import Enum
+import numpy as np
+
+import InputData as D
+import MultiCohortClasses as Cls
+import ParameterClasses as P
+from InputData import HealthStates
+from MarkovModelClasses import Cohort, CohortEngines
+
+RACES = list(P.Races)   # races to analyze
+POP_SIZE = 20000        # population size of each cohort
+ENGINE = CohortEngines.VECTORIZED  # method to simulate each cohort
+N_WORKERS = None        # number of processes to simulate cohorts (None to use all available cores)
+COHORT_ID = 0           # id (and so the random stream) of all cohorts
+RELATIVE_RANGE = 0.25   # inputs are varied by this fraction below and above their base-case values
+DISCOUNT_RANGE = (0, 0.05)  # low and high discount rates
+
+
+class InputTypes(Enum):
+    """ inputs of the model that can be varied """
+    SCREENING_COST = 0      # annual cost of biennial screening
+    STATE_COST = 1          # annual cost of a health state
+    STATE_UTILITY = 2       # annual health utility of a health state
+    DISCOUNT = 3            # annual discount rate
+    BACKGROUND_MORT = 4     # annual probability of death from other causes
+    TRANS_PROB = 5          # annual probability of a transition between breast cancer states
+
+
+class TornadoOutcomes(Enum):
+    """ outcomes reported in tornado tables """
+    INCREMENTAL_COST = 0
+    INCREMENTAL_QALY = 1
+    ICER = 2
+
+
+class SensitivityInput:
+    def __init__(self, name, input_type, base, low, high, state=None, to_state=None, therapy=None):
+        """ an input of the model and the range over which it is varied
+        :param name: name of the input
+        :param input_type: (InputTypes) type of the input
+        :param base: base-case value
+        :param low: low value
+        :param high: high value
+        :param state: (HealthStates) health state of a state cost or utility, or the state a transition is from
+        :param to_state: (HealthStates) state a transition is to
+        :param therapy: (Therapies) therapy whose transition probability is varied
+        """
+        self.name = name
+        self.inputType = input_type
+        self.base = base
+        self.low = low
+        self.high = high
+        self.state = state
+        self.toState = to_state
+        self.therapy = therapy
+
+
+def get_sensitivity_inputs(race, relative_range=RELATIVE_RANGE):
+    """
+    :param race: race of the patients
+    :param relative_range: inputs are varied by this fraction below and above their base-case values
+    :return: (list) of SensitivityInput varied in the one-way sensitivity analysis of this race
+    """
+
+    inputs = []
+    alive_states = [s for s in HealthStates if s not in (HealthStates.CANCER_DEATH, HealthStates.NATUAL_DEATH)]
+
+    def add_input(name, input_type, base, upper_bound=np.inf, **kwargs):
+        # vary the input by the relative range (within its bounds)
+        inputs.append(SensitivityInput(name=name, input_type=input_type, base=base,
+                                       low=max(0, base * (1 - relative_range)),
+                                       high=min(upper_bound, base * (1 + relative_range)),
+                                       **kwargs))
+
+    # costs
+    add_input('Screening cost', InputTypes.SCREENING_COST, D.BI_COST)
+    for s in alive_states:
+        # states without costs cannot be varied by a fraction
+        if D.ANNUAL_STATE_COST[s.value] > 0:
+            add_input('Cost of ' + s.name, InputTypes.STATE_COST, D.ANNUAL_STATE_COST[s.value], state=s)
+
+    # utilities
+    for s in alive_states:
+        add_input('Utility of ' + s.name, InputTypes.STATE_UTILITY, D.ANNUAL_STATE_UTILITIES[race.value, s.value],
+                  upper_bound=1, state=s)
+
+    # discount rate
+    inputs.append(SensitivityInput(name='Discount rate', input_type=InputTypes.DISCOUNT, base=D.DISCOUNT,
+                                   low=DISCOUNT_RANGE[0], high=DISCOUNT_RANGE[1]))
+
+    # background mortality
+    add_input('Background mortality', InputTypes.BACKGROUND_MORT, D.ANNUAL_PROB_BACKGROUND_MORT, upper_bound=1)
+
+    # probabilities of transitions to another state (the probability of staying changes accordingly)
+    for therapy in P.Therapies:
+        probs = P.get_trans_prob_matrices(trans_counts=D.TRANS_COUNTS[race.value, therapy.value])
+        for s in alive_states:
+            for to_state in HealthStates:
+                if to_state.value < probs.shape[1] and to_state != s and probs[s.value, to_state.value] > 0:
+                    # at least half of the probability of staying is kept (so the state is not left
+                    # at an infinite rate)
+                    upper_bound = probs[s.value, to_state.value] + probs[s.value, s.value] / 2
+                    add_input('Probability {} -> {} ({})'.format(s.name, to_state.name, therapy.name),
+                              InputTypes.TRANS_PROB, probs[s.value, to_state.value], upper_bound=upper_bound,
+                              state=s, to_state=to_state, therapy=therapy)
+
+    return inputs
+
+
+def get_parameters(therapy, race, changes=()):
+    """
+    :param therapy: selected therapy
+    :param race: race of the patients
+    :param changes: (list) of (SensitivityInput, value) to change (empty for the base case)
+    :return: base-case parameters with the values of the inputs changed
+    """
+
+    param = P.Parameters(therapy=therapy, race=race)
+    if len(changes) == 0:
+        return param
+
+    # transition probabilities and background mortality (the transition matrices are recalculated
+    # only if one of them is changed)
+    probs = P.get_trans_prob_matrices(trans_counts=D.TRANS_COUNTS[race.value, therapy.value])
+    background_mort = D.ANNUAL_PROB_BACKGROUND_MORT
+    if_trans_changed = False
+
+    for sensitivity_input, value in changes:
+        input_type = sensitivity_input.inputType
+        if input_type == InputTypes.SCREENING_COST:
+            if therapy == P.Therapies.BI:
+                param.annualTreatmentCost = value
+        elif input_type == InputTypes.STATE_COST:
+            param.annualStateCosts = list(param.annualStateCosts)
+            param.annualStateCosts[sensitivity_input.state.value] = value
+        elif input_type == InputTypes.STATE_UTILITY:
+            param.annualStateUtilities[sensitivity_input.state.value] = value
+        elif input_type == InputTypes.DISCOUNT:
+            param.discountRate = value
+        elif input_type == InputTypes.BACKGROUND_MORT:
+            background_mort = value
+            if_trans_changed = True
+        elif sensitivity_input.therapy == therapy:
+            # change the transition probability and the probability of staying in the same state
+            i, j = sensitivity_input.state.value, sensitivity_input.toState.value
+            probs[i, i] += probs[i, j] - value
+            probs[i, j] = value
+            if_trans_changed = True
+
+    if if_trans_changed:
+        # transition matrices with the changed probabilities
+        param.transRateMatrix = P.get_trans_rate_matrices(
+            trans_prob_matrices=probs, annual_prob_background_mort=background_mort)
+        param.transProbMatrix = P.get_annual_trans_prob_matrix(
+            trans_prob_matrix=probs, annual_prob_background_mort=background_mort)
+
+    return param
+
+
+class TornadoTable:
+    def __init__(self, race, inputs, base_outcomes, low_outcomes, high_outcomes):
+        """ one-way sensitivity analysis of biennial screening versus no screening
+        :param race: race of the patients
+        :param inputs: (list) of SensitivityInput
+        :param base_outcomes: (array) base-case outcomes indexed by TornadoOutcomes
+        :param low_outcomes: (array) outcomes at the low value of each input indexed by (input, TornadoOutcomes)
+        :param high_outcomes: (array) outcomes at the high value of each input indexed by (input, TornadoOutcomes)
+        """
+        self.race = race
+        self.inputs = inputs
+        self.baseOutcomes = base_outcomes
+        self.lowOutcomes = low_outcomes
+        self.highOutcomes = high_outcomes
+
+    def get_sorted_inputs(self, outcome=TornadoOutcomes.ICER):
+        """
+        :param outcome: (TornadoOutcomes) outcome to sort by
+        :return: (list) of indices of inputs sorted by the swing of the outcome (largest first)
+        """
+        swings = np.abs(self.highOutcomes[:, outcome.value] - self.lowOutcomes[:, outcome.value])
+        # inputs with undefined swings go last
+        return sorted(range(len(self.inputs)), key=lambda i: -swings[i] if np.isfinite(swings[i]) else np.inf)
+
+    def print_table(self, outcome=TornadoOutcomes.ICER):
+        """ prints the outcome at the low and high value of each input (sorted by swing)
+        :param outcome: (TornadoOutcomes) outcome to report
+        """
+
+        print('Tornado table of', outcome.name, '(', self.race, ')')
+        print('{:<40} {:>12} {:>12} {:>14} {:>14} {:>14}'.format(
+            'Input', 'Low', 'High', 'Outcome (low)', 'Outcome (high)', 'Swing'))
+        print('{:<40} {:>12} {:>12} {:>14,.4f}'.format('Base case', '', '', self.baseOutcomes[outcome.value]))
+        for i in self.get_sorted_inputs(outcome=outcome):
+            low = self.lowOutcomes[i, outcome.value]
+            high = self.highOutcomes[i, outcome.value]
+            print('{:<40} {:>12.4g} {:>12.4g} {:>14,.4f} {:>14,.4f} {:>14,.4f}'.format(
+                self.inputs[i].name, self.inputs[i].low, self.inputs[i].high, low, high, abs(high - low)))
+        print('')
+
+    def export_to_csv(self, file_name):
+        """ writes the outcomes at the low and high value of each input to a csv file
+        :param file_name: name of the csv file
+        """
+
+        with open(file_name, 'w') as file:
+            file.write('Input,Base,Low,High' + ''.join(
+                ',{0} (base),{0} (low),{0} (high)'.format(o.name) for o in TornadoOutcomes) + '\n')
+            for i in self.get_sorted_inputs():
+                file.write('"{}",{},{},{}'.format(
+                    self.inputs[i].name, self.inputs[i].base, self.inputs[i].low, self.inputs[i].high))
+                for o in TornadoOutcomes:
+                    file.write(',{},{},{}'.format(
+                        self.baseOutcomes[o.value], self.lowOutcomes[i, o.value], self.highOutcomes[i, o.value]))
+                file.write('\n')
+
+
+def run_one_way_analysis(races=RACES, pop_size=POP_SIZE, sim_length=D.SIM_LENGTH, engine=ENGINE,
+                         n_workers=N_WORKERS, relative_range=RELATIVE_RANGE):
+    """ simulates biennial screening and no screening at the low and high value of each input
+    (all cohorts use the same random stream so that differences are due to the inputs only)
+    :param races: (list) of races to analyze
+    :param pop_size: population size of each cohort
+    :param sim_length: simulation length
+    :param engine: (CohortEngines) method to simulate each cohort
+    :param n_workers: number of processes to simulate cohorts in parallel
+        (1 to simulate cohorts serially, None to use all available cores)
+    :param relative_range: inputs are varied by this fraction below and above their base-case values
+    :return: (dictionary) of TornadoTable of each race
+    """
+
+    # the base case and every low/high variant of the inputs of each race
+    inputs = {race: get_sensitivity_inputs(race=race, relative_range=relative_range) for race in races}
+    variants = []
+    for race in races:
+        variants.append((race, None, None))
+        for sensitivity_input in inputs[race]:
+            variants.append((race, sensitivity_input, sensitivity_input.low))
+            variants.append((race, sensitivity_input, sensitivity_input.high))
+
+    # a cohort with and without screening for each variant
+    cohorts = [Cohort(id=COHORT_ID,
+                      pop_size=pop_size,
+                      parameters=get_parameters(therapy=therapy, race=race,
+                                                changes=[] if sensitivity_input is None
+                                                else [(sensitivity_input, value)]),
+                      engine=engine,
+                      if_streaming=True)
+               for race, sensitivity_input, value in variants
+               for therapy in (P.Therapies.NO, P.Therapies.BI)]
+
+    # simulate all cohorts concurrently
+    cohorts = Cls.simulate_cohorts(cohorts=cohorts, sim_length=sim_length, n_workers=n_workers)
+
+    # incremental outcomes of screening for each variant
+    costs = np.array([cohort.cohortOutcomes.statCost.get_mean() for cohort in cohorts]).reshape(-1, 2)
+    qalys = np.array([cohort.cohortOutcomes.statUtility.get_mean() for cohort in cohorts]).reshape(-1, 2)
+    outcomes = np.zeros((len(variants), len(TornadoOutcomes)))
+    outcomes[:, TornadoOutcomes.INCREMENTAL_COST.value] = costs[:, 1] - costs[:, 0]
+    outcomes[:, TornadoOutcomes.INCREMENTAL_QALY.value] = qalys[:, 1] - qalys[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        outcomes[:, TornadoOutcomes.ICER.value] = outcomes[:, 0] / outcomes[:, 1]
+
+    # tornado table of each race
+    tables = {}
+    start = 0
+    for race in races:
+        n = len(inputs[race])
+        tables[race] = TornadoTable(race=race,
+                                    inputs=inputs[race],
+                                    base_outcomes=outcomes[start],
+                                    low_outcomes=outcomes[start + 1:start + 1 + 2 * n:2],
+                                    high_outcomes=outcomes[start + 2:start + 2 + 2 * n:2])
+        start += 1 + 2 * n
+
+    return tables
+
+
+def run_two_way_analysis(race, input_1, input_2, n_values=5, pop_size=POP_SIZE, sim_length=D.SIM_LENGTH,
+                         engine=ENGINE, n_workers=N_WORKERS):
+    """ simulates biennial screening and no screening over a grid of the values of two inputs
+    (all cohorts use the same random stream)
+    :param race: race of the patients
+    :param input_1: (SensitivityInput) first input
+    :param input_2: (SensitivityInput) second input
+    :param n_values: number of values of each input between its low and high values
+    :param pop_size: population size of each cohort
+    :param sim_length: simulation length
+    :param engine: (CohortEngines) method to simulate each cohort
+    :param n_workers: number of processes to simulate cohorts in parallel
+    :return: (values of the first input, values of the second input, array of outcomes indexed by
+        (value of the first input, value of the second input, TornadoOutcomes))
+    """
+
+    values_1 = np.linspace(input_1.low, input_1.high, n_values)
+    values_2 = np.linspace(input_2.low, input_2.high, n_values)
+
+    cohorts = []
+    for value_1 in values_1:
+        for value_2 in values_2:
+            for therapy in (P.Therapies.NO, P.Therapies.BI):
+                param = get_parameters(therapy=therapy, race=race,
+                                       changes=[(input_1, value_1), (input_2, value_2)])
+                cohorts.append(Cohort(id=COHORT_ID, pop_size=pop_size, parameters=param, engine=engine,
+                                      if_streaming=True))
+
+    # simulate all cohorts concurrently
+    cohorts = Cls.simulate_cohorts(cohorts=cohorts, sim_length=sim_length, n_workers=n_workers)
+
+    costs = np.array([cohort.cohortOutcomes.statCost.get_mean() for cohort in cohorts]).reshape(n_values, n_values, 2)
+    qalys = np.array([cohort.cohortOutcomes.statUtility.get_mean() for cohort in cohorts]).reshape(n_values, n_values, 2)
+    outcomes = np.zeros((n_values, n_values, len(TornadoOutcomes)))
+    outcomes[..., TornadoOutcomes.INCREMENTAL_COST.value] = costs[..., 1] - costs[..., 0]
+    outcomes[..., TornadoOutcomes.INCREMENTAL_QALY.value] = qalys[..., 1] - qalys[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        outcomes[..., TornadoOutcomes.ICER.value] = outcomes[..., 0] / outcomes[..., 1]
+
+    return values_1, values_2, outcomes
+
+
+if __name__ == '__main__':
+
+    # one-way sensitivity analysis of all races
+    tornadoTables = run_one_way_analysis()
+
+    # report the tornado tables
+    for r, table in tornadoTables.items():
+        for o in TornadoOutcomes:
+            table.print_table(outcome=o)
+        table.export_to_csv(file_name='TornadoTable-{}.csv'.format(r.name))
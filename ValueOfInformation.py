@@ -0,0 +1,198 @@
+from itertools import combinations_with_replacement
+from math import comb
+import numpy as np
+
+from InputData import HealthStates
+
+
+def get_net_benefits(multi_cohorts, wtps):
+    """
+    :param multi_cohorts: (list) of simulated multi-cohorts, one for each strategy (for example, without and
+        with biennial screening), whose cohorts are paired by position
+    :param wtps: (list) of willingness-to-pay values for one additional QALY
+    :return: (array) net monetary benefit of each cohort, indexed by (strategy, cohort, wtp)
+    """
+
+    n_cohorts = [len(multi_cohort.multiCohortOutcomes.meanCosts) for multi_cohort in multi_cohorts]
+    if len(set(n_cohorts)) > 1:
+        raise ValueError('All multi-cohorts should have the same number of simulated cohorts.')
+
+    costs = np.array([multi_cohort.multiCohortOutcomes.meanCosts for multi_cohort in multi_cohorts])
+    qalys = np.array([multi_cohort.multiCohortOutcomes.meanQALYs for multi_cohort in multi_cohorts])
+    wtps = np.asarray(wtps, dtype=float)
+
+    return qalys[:, :, None] * wtps - costs[:, :, None]
+
+
+def get_evpi(multi_cohorts, wtps):
+    """ calculates the expected value of perfect information
+    :param multi_cohorts: (list) of simulated multi-cohorts, one for each strategy
+    :param wtps: (list) of willingness-to-pay values for one additional QALY
+    :return: (array) EVPI per patient at each willingness-to-pay value
+    """
+
+    net_benefits = get_net_benefits(multi_cohorts=multi_cohorts, wtps=wtps)
+
+    # expected net benefit with perfect information minus expected net benefit of the best strategy
+    return net_benefits.max(axis=0).mean(axis=0) - net_benefits.mean(axis=1).max(axis=0)
+
+
+def get_parameter_groups(multi_cohorts):
+    """
+    :param multi_cohorts: (list) of multi-cohorts, one for each strategy
+    :return: (dictionary) of the sampled values of each group of parameters (name of group -> array indexed
+        by (cohort, parameter)); parameters of all strategies are included and parameters that do not vary
+        across cohorts are removed
+    """
+
+    groups = {}
+    alive_states = [s for s in HealthStates if s not in (HealthStates.CANCER_DEATH, HealthStates.NATUAL_DEATH)]
+
+    # transition probabilities out of each state (dirichlet rows)
+    for s in alive_states:
+        groups['Transitions from ' + s.name] = _get_values(
+            multi_cohorts, lambda param: np.asarray(param.transProbMatrix)[s.value])
+    groups['All transitions'] = np.hstack([groups['Transitions from ' + s.name] for s in alive_states])
+
+    # annual state costs and utilities
+    groups['State costs'] = _get_values(
+        multi_cohorts, lambda param: np.asarray(param.annualStateCosts)[:len(alive_states)])
+    groups['State utilities'] = _get_values(
+        multi_cohorts, lambda param: np.asarray(param.annualStateUtilities)[:len(alive_states)])
+
+    # all parameters (the EVPPI of all parameters is the EVPI)
+    groups['All parameters'] = np.hstack([groups['All transitions'], groups['State costs'], groups['State utilities']])
+
+    return groups
+
+
+def get_evppi(multi_cohorts, wtps, groups=None, max_degree=2):
+    """ calculates the expected value of partial perfect information of groups of parameters by regressing
+    the net monetary benefits of the simulated cohorts on the sampled values of each group of parameters
+    (single-loop method of Strong, Oakley and Brennan (2014) with a polynomial least-squares regression)
+    :param multi_cohorts: (list) of simulated multi-cohorts, one for each strategy, whose cohorts are paired
+    :param wtps: (list) of willingness-to-pay values for one additional QALY
+    :param groups: (dictionary) of the sampled values of each group of parameters
+        (if not provided, the groups returned by get_parameter_groups are used)
+    :param max_degree: maximum degree of the polynomial of the parameters in the regression (for each group,
+        the degree is chosen by generalized cross-validation)
+    :return: (dictionary) of EVPPI per patient at each willingness-to-pay value (name of group -> array)
+    """
+
+    if groups is None:
+        groups = get_parameter_groups(multi_cohorts=multi_cohorts)
+
+    # costs and QALYs of each strategy relative to the first strategy
+    costs = np.array([multi_cohort.multiCohortOutcomes.meanCosts for multi_cohort in multi_cohorts])
+    qalys = np.array([multi_cohort.multiCohortOutcomes.meanQALYs for multi_cohort in multi_cohorts])
+    incremental_costs = (costs - costs[0]).T
+    incremental_qalys = (qalys - qalys[0]).T
+    wtps = np.asarray(wtps, dtype=float)
+
+    evppi = {}
+    for name, values in groups.items():
+        # expected incremental costs and QALYs conditional on the values of this group of parameters
+        # (the regression is linear in the outcomes, so net benefits at all wtp values follow from
+        # the fitted costs and QALYs)
+        fitted_costs, fitted_qalys = _get_regression_fitted_values(
+            x=values, ys=[incremental_costs, incremental_qalys], max_degree=max_degree)
+
+        # fitted incremental net benefits indexed by (cohort, strategy, wtp)
+        net_benefits = fitted_qalys[:, :, None] * wtps - fitted_costs[:, :, None]
+
+        # expected net benefit of choosing the best strategy after learning the parameters of this group
+        # minus expected net benefit of the best strategy
+        evppi[name] = net_benefits.max(axis=1).mean(axis=0) - net_benefits.mean(axis=0).max(axis=0)
+
+    return evppi
+
+
+def print_evppi(evpi, evppi, wtps):
+    """ prints the EVPI and the EVPPI of each group of parameters
+    :param evpi: (array) EVPI at each willingness-to-pay value
+    :param evppi: (dictionary) of EVPPI at each willingness-to-pay value returned by get_evppi
+    :param wtps: (list) of willingness-to-pay values
+    """
+
+    print('{:<34}'.format('WTP') + ''.join('{:>12,.0f}'.format(wtp) for wtp in wtps))
+    print('{:<34}'.format('EVPI') + ''.join('{:>12,.2f}'.format(v) for v in evpi))
+    for name, values in evppi.items():
+        print('{:<34}'.format('EVPPI: ' + name) + ''.join('{:>12,.2f}'.format(v) for v in values))
+
+
+def _get_values(multi_cohorts, get_value):
+    """
+    :param multi_cohorts: (list) of multi-cohorts
+    :param get_value: function that returns an array of parameter values of a parameter set
+    :return: (array) of parameter values of all strategies indexed by (cohort, parameter)
+        (parameters that do not vary across cohorts are removed)
+    """
+
+    values = np.hstack([np.array([get_value(param) for param in multi_cohort.paramSets], dtype=float)
+                        for multi_cohort in multi_cohorts])
+    return values[:, values.std(axis=0) > 0]
+
+
+def _get_regression_fitted_values(x, ys, max_degree):
+    """
+    :param x: (array) values of the regressors indexed by (observation, regressor)
+    :param ys: (list) of arrays of responses indexed by (observation, ...)
+    :param max_degree: maximum degree of the polynomial (with interactions) of the linearly independent
+        combinations of regressors; the degree with the smallest generalized cross-validation error is used
+        among those with fewer coefficients than half the number of observations (a degree of 1 is always tried)
+    :return: (list) of arrays of the responses fitted by least squares
+    """
+
+    x = np.asarray(x, dtype=float)
+    n_observations = len(x)
+
+    # scale regressors that vary
+    x = x - x.mean(axis=0)
+    stds = x.std(axis=0)
+    x = x[:, stds > 0] / stds[stds > 0]
+
+    # linearly independent combinations of regressors (principal components with unit variance), since
+    # regressors of a group can be collinear (for example, the probabilities of a row of transitions)
+    if x.shape[1] > 0:
+        u, singular_values, vt = np.linalg.svd(x, full_matrices=False)
+        x = u[:, singular_values > singular_values[0] * 1e-8] * np.sqrt(n_observations)
+    n_regressors = x.shape[1]
+    if n_regressors == 0:
+        # no information about outcomes: the fitted response is the average response
+        return [np.broadcast_to(y.mean(axis=0), y.shape) for y in ys]
+
+    # responses as columns (scaled so that responses in different units contribute equally to the error)
+    responses = np.hstack([np.asarray(y, dtype=float).reshape(n_observations, -1) for y in ys])
+    scales = responses.std(axis=0)
+    scales[scales == 0] = 1
+
+    best_gcv, best_fitted = np.inf, None
+    for degree in range(1, max_degree + 1):
+        n_coefficients = comb(n_regressors + degree, degree)
+        if degree > 1 and n_coefficients > n_observations / 2:
+            break
+
+        # products of up to degree combinations of regressors (the polynomial does not depend on how
+        # the combinations are chosen)
+        design = np.ones((n_observations, n_coefficients))
+        column = 1
+        for k in range(1, degree + 1):
+            for indices in combinations_with_replacement(range(n_regressors), k):
+                design[:, column] = np.prod(x[:, indices], axis=1)
+                column += 1
+
+        # least-squares fit and its generalized cross-validation error
+        fitted = design @ np.linalg.lstsq(design, responses, rcond=None)[0]
+        gcv = (((responses - fitted) / scales) ** 2).sum() * n_observations \
+            / max(n_observations - n_coefficients, 1) ** 2
+        if gcv < best_gcv:
+            best_gcv, best_fitted = gcv, fitted
+
+    # split the fitted responses
+    fitted_ys = []
+    start = 0
+    for y in ys:
+        n_columns = int(np.prod(np.shape(y)[1:]))
+        fitted_ys.append(best_fitted[:, start:start + n_columns].reshape(np.shape(y)))
+        start += n_columns
+    return fitted_ys
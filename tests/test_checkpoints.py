@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import MultiCohortClasses as Cls
+from MarkovModelClasses import CohortEngines
+from ParameterClasses import Races, Therapies
+from ProbilisticParamClasses import SamplingMethods
+
+SIM_LENGTH = 25
+
+
+def get_multi_cohort(n_cohorts, checkpoint_dir=None, param_seed=None, sampling=SamplingMethods.RANDOM):
+    return Cls.MultiCohort(ids=range(n_cohorts), pop_size=50, therapy=Therapies.BI, race=Races.White,
+                           engine=CohortEngines.VECTORIZED, param_seed=param_seed, sampling=sampling,
+                           checkpoint_dir=checkpoint_dir)
+
+
+@pytest.mark.parametrize('param_seed, sampling', [(None, SamplingMethods.RANDOM),
+                                                  (7, SamplingMethods.RANDOM),
+                                                  (None, SamplingMethods.LATIN_HYPERCUBE)])
+def test_resume_and_extend_is_the_same_as_a_fresh_run(tmp_path, param_seed, sampling):
+    # fresh run
+    fresh = get_multi_cohort(n_cohorts=10, param_seed=param_seed, sampling=sampling)
+    fresh.simulate(sim_length=SIM_LENGTH)
+
+    # run the first cohorts, and then resume from the checkpoints with more cohorts
+    get_multi_cohort(n_cohorts=5, checkpoint_dir=str(tmp_path), param_seed=param_seed,
+                     sampling=sampling).simulate(sim_length=SIM_LENGTH)
+    resumed = get_multi_cohort(n_cohorts=10, checkpoint_dir=str(tmp_path), param_seed=param_seed, sampling=sampling)
+    resumed.simulate(sim_length=SIM_LENGTH)
+
+    np.testing.assert_array_equal(resumed.multiCohortOutcomes.meanCosts, fresh.multiCohortOutcomes.meanCosts)
+    np.testing.assert_array_equal(resumed.multiCohortOutcomes.meanQALYs, fresh.multiCohortOutcomes.meanQALYs)
+
+
+def test_checkpoints_of_the_same_parameter_sets_are_reused(tmp_path):
+    get_multi_cohort(n_cohorts=5, checkpoint_dir=str(tmp_path)).simulate(sim_length=SIM_LENGTH)
+
+    # the parameter set of each cohort depends only on its position, so only new cohorts are simulated
+    resumed = get_multi_cohort(n_cohorts=10, checkpoint_dir=str(tmp_path))
+    assert len(resumed.get_cohorts(sim_length=SIM_LENGTH)) == 5
+
+
+def test_checkpoints_of_a_different_simulation_length_are_rejected(tmp_path):
+    get_multi_cohort(n_cohorts=5, checkpoint_dir=str(tmp_path)).simulate(sim_length=SIM_LENGTH)
+
+    resumed = get_multi_cohort(n_cohorts=10, checkpoint_dir=str(tmp_path))
+    with pytest.raises(ValueError, match='simulation length'):
+        resumed.simulate(sim_length=SIM_LENGTH + 5)
@@ -0,0 +1,18 @@
+import numpy as np
+
+import EventLog
+from InputData import HealthStates
+
+
+def test_large_patient_ids_are_not_wrapped(tmp_path):
+    file_name = str(tmp_path / 'events.bin')
+    patient_ids = np.array([0, 2**31, 3 * 10**9], dtype=np.int64)
+
+    with EventLog.EventLogWriter(file_name=file_name) as event_log:
+        event_log.add_events(patient_ids=patient_ids, states=[HealthStates.LOCAL.value] * 3, times=[1, 2, 3])
+        event_log.add_event(patient_id=5 * 10**9, state=HealthStates.LOCAL.value, time=4)
+
+    ids, times = EventLog.get_state_entry_times(events=EventLog.read_event_log(file_name),
+                                                state=HealthStates.LOCAL)
+    np.testing.assert_array_equal(ids, [0, 2**31, 3 * 10**9, 5 * 10**9])
+    np.testing.assert_array_equal(times, [1, 2, 3, 4])
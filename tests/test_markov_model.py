@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+from scipy.integrate import quad
+from scipy.linalg import expm
+
+import MarkovModelClasses as Cls
+import ParameterClasses as P
+from InputData import HealthStates
+from ParameterClasses import Races, Therapies
+
+
+def test_occupancy_probs_on_a_grid_are_the_state_probabilities_at_each_time():
+    generator = Cls.CompiledMarkovModel(
+        trans_rate_matrix=P.Parameters(therapy=Therapies.BI, race=Races.White).transRateMatrix).get_generator()
+    p0 = np.zeros(len(generator))
+    p0[0] = 1
+    # a uniform grid with a shorter last step
+    times = Cls.get_survival_curve_times(sim_length=10.1)
+
+    probs = Cls._get_occupancy_probs(p0=p0, generator=generator, times=times)
+
+    expected = np.array([p0 @ expm(generator * t) for t in times])
+    np.testing.assert_allclose(probs, expected, rtol=1e-9, atol=1e-12)
+
+
+def get_expected_outcomes(therapy, race, sim_length):
+    cohort = Cls.Cohort(id=0, pop_size=1, parameters=P.Parameters(therapy=therapy, race=race),
+                        engine=Cls.CohortEngines.ANALYTIC)
+    cohort.simulate(sim_length=sim_length)
+    return cohort.cohortOutcomes
+
+
+def assert_agrees_with_expected_outcomes(outcomes, expected):
+    # sample means of simulated patients are within 4 standard errors of the expected values
+    for observations, stat in ((outcomes.survivalTimes, expected.statSurvivalTime),
+                               (outcomes.costs, expected.statCost),
+                               (outcomes.utilities, expected.statUtility),
+                               (outcomes.nCancer, expected.statNCancer),
+                               (outcomes.nCancerDeath, expected.statNCancerDeath)):
+        standard_error = np.std(observations, ddof=1) / np.sqrt(len(observations))
+        assert abs(np.mean(observations) - stat.get_mean()) <= 4 * standard_error, stat.name
+
+    # share of patients alive at the end of the simulation
+    pop_size = len(outcomes.costs)
+    prob_alive = expected.nLivingPatients[-1] / expected.statCost.n
+    standard_error = np.sqrt(prob_alive * (1 - prob_alive) / pop_size)
+    assert abs(outcomes.nLivingPatients[-1] / pop_size - prob_alive) <= 4 * standard_error
+
+
+@pytest.mark.parametrize('engine, pop_size', [(Cls.CohortEngines.VECTORIZED, 40000),
+                                              (Cls.CohortEngines.PATIENT, 5000)])
+@pytest.mark.parametrize('therapy', [Therapies.NO, Therapies.BI])
+def test_simulated_patients_agree_with_the_analytic_engine(engine, pop_size, therapy):
+    cohort = Cls.Cohort(id=1, pop_size=pop_size, parameters=P.Parameters(therapy=therapy, race=Races.White),
+                        engine=engine)
+    cohort.simulate(sim_length=25)
+
+    assert_agrees_with_expected_outcomes(
+        outcomes=cohort.cohortOutcomes,
+        expected=get_expected_outcomes(therapy=therapy, race=Races.White, sim_length=25))
+
+
+def test_mixed_cohort_of_one_race_agrees_with_the_analytic_engine():
+    cohort = Cls.MixedCohort(id=1, pop_size=40000,
+                             parameters={Races.Black: P.Parameters(therapy=Therapies.NO, race=Races.Black)},
+                             race_shares={Races.Black: 1})
+    cohort.simulate(sim_length=25)
+
+    assert_agrees_with_expected_outcomes(
+        outcomes=cohort.cohortOutcomes,
+        expected=get_expected_outcomes(therapy=Therapies.NO, race=Races.Black, sim_length=25))
+
+
+def test_expected_outcomes_of_a_chain_with_a_closed_form_solution():
+    # well -> local cancer at rate a, well -> natural death at rate b, local cancer -> cancer death at rate c
+    a, b, c, discount_rate, sim_length = 0.1, 0.05, 0.2, 0.03, 20
+    parameters = P.Parameters(therapy=Therapies.NO, race=Races.White)
+    rates = np.zeros((len(HealthStates), len(HealthStates)))
+    rates[HealthStates.WELL.value, HealthStates.LOCAL.value] = a
+    rates[HealthStates.WELL.value, HealthStates.NATUAL_DEATH.value] = b
+    rates[HealthStates.LOCAL.value, HealthStates.CANCER_DEATH.value] = c
+    parameters.transRateMatrix = rates
+    parameters.annualStateCosts = [100, 1000, 0, 0, 0, 0]
+    parameters.annualTreatmentCost = 0
+    parameters.discountRate = discount_rate
+
+    cohort = Cls.Cohort(id=0, pop_size=1000, parameters=parameters, engine=Cls.CohortEngines.ANALYTIC)
+    cohort.simulate(sim_length=sim_length)
+    outcomes = cohort.cohortOutcomes
+
+    # probability of being well or having local cancer at time t
+    k = a + b
+    def prob_well(t):
+        return np.exp(-k * t)
+    def prob_local(t):
+        return a / (c - k) * (np.exp(-k * t) - np.exp(-c * t))
+    def survival(t):
+        return prob_well(t) + prob_local(t)
+
+    # survival curve
+    times = outcomes.survivalCurveTimes
+    np.testing.assert_allclose(outcomes.nLivingPatients, 1000 * survival(times), rtol=1e-9)
+
+    # expected survival time of patients who die before the end of the simulation
+    def density(t):
+        return b * prob_well(t) + c * prob_local(t)
+    mean_survival_time = quad(lambda t: t * density(t), 0, sim_length)[0] / (1 - survival(sim_length))
+    np.testing.assert_allclose(outcomes.statSurvivalTime.get_mean(), mean_survival_time, rtol=1e-9)
+
+    # expected numbers of transitions into local cancer and into cancer death
+    time_well = (1 - np.exp(-k * sim_length)) / k
+    time_local = a / (c - k) * ((1 - np.exp(-k * sim_length)) / k - (1 - np.exp(-c * sim_length)) / c)
+    np.testing.assert_allclose(outcomes.statNCancer.get_mean(), a * time_well, rtol=1e-9)
+    np.testing.assert_allclose(outcomes.statNCancerDeath.get_mean(), c * time_local, rtol=1e-9)
+
+    # expected discounted cost
+    def discounted_time(rate):
+        return (1 - np.exp(-(rate + discount_rate) * sim_length)) / (rate + discount_rate)
+    cost = 100 * discounted_time(k) + 1000 * a / (c - k) * (discounted_time(k) - discounted_time(c))
+    np.testing.assert_allclose(outcomes.statCost.get_mean(), cost, rtol=1e-9)
+
+
+def test_streaming_stat_of_chunks_matches_numpy():
+    rng = np.random.RandomState(seed=1)
+    # a large offset makes a naive sum of squares lose precision
+    obs = 1e6 + rng.normal(size=10000)
+
+    stat = Cls.StreamingStat(name='obs')
+    start = 0
+    for size in [1, 0, 999, 3000, 1, 5999]:
+        if size == 1:
+            stat.record(obs[start])
+        else:
+            stat.record_batch(obs[start:start + size])
+        start += size
+
+    assert stat.n == len(obs)
+    np.testing.assert_allclose(stat.get_mean(), np.mean(obs), rtol=1e-12)
+    np.testing.assert_allclose(stat.get_stdev(), np.std(obs, ddof=1), rtol=1e-9)
+    np.testing.assert_allclose(stat.get_total(), np.sum(obs), rtol=1e-12)
+    assert stat.get_min() == obs.min() and stat.get_max() == obs.max()
+
+
+@pytest.mark.parametrize('engine', [Cls.CohortEngines.VECTORIZED, Cls.CohortEngines.PATIENT])
+def test_streaming_cohort_has_the_statistics_of_a_stored_cohort(engine):
+    outcomes = []
+    for if_streaming in (False, True):
+        cohort = Cls.Cohort(id=1, pop_size=2000, parameters=P.Parameters(therapy=Therapies.BI, race=Races.White),
+                            engine=engine, if_streaming=if_streaming)
+        cohort.simulate(sim_length=25)
+        outcomes.append(cohort.cohortOutcomes)
+    stored, streamed = outcomes
+
+    for observations, stat in ((stored.survivalTimes, streamed.statSurvivalTime),
+                               (stored.costs, streamed.statCost),
+                               (stored.utilities, streamed.statUtility)):
+        np.testing.assert_allclose(stat.get_mean(), np.mean(observations), rtol=1e-9)
+        np.testing.assert_allclose(stat.get_stdev(), np.std(observations, ddof=1), rtol=1e-9)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import MultiCohortClasses as Cls
+from MarkovModelClasses import CohortEngines
+from ParameterClasses import Races, Therapies
+
+
+@pytest.mark.parametrize('engine', [CohortEngines.TRACE, CohortEngines.TRACE_HALF_CYCLE])
+def test_probabilistic_analysis_with_the_cohort_trace_warns(engine):
+    with pytest.warns(UserWarning, match='not comparable'):
+        Cls.MultiCohort(ids=range(2), pop_size=1, therapy=Therapies.NO, race=Races.White, engine=engine)
+
+
+def get_multi_cohort(engine):
+    return Cls.MultiCohort(ids=range(8), pop_size=200, therapy=Therapies.BI, race=Races.White, engine=engine)
+
+
+@pytest.mark.parametrize('engine', [CohortEngines.PATIENT, CohortEngines.VECTORIZED])
+def test_parallel_simulation_is_identical_to_serial_simulation(engine):
+    serial = get_multi_cohort(engine=engine)
+    serial.simulate(sim_length=25, n_workers=1)
+
+    # cohorts are checkpointed in the order of their ids
+    simulated_ids = []
+    cohorts = get_multi_cohort(engine=engine).get_cohorts(sim_length=25)
+    parallel = Cls.simulate_cohorts(cohorts=cohorts, sim_length=25, n_workers=3,
+                                    callback=lambda i, cohort: simulated_ids.append(cohort.id))
+    assert simulated_ids == list(range(8))
+
+    outcomes = Cls.MultiCohortOutcomes()
+    for cohort in parallel:
+        outcomes.extract_outcomes(simulated_cohort=cohort)
+    outcomes.calculate_summary_stats()
+
+    for name in ('meanSurvivalTimes', 'meanNCancer', 'nCancerDeath', 'meanCosts', 'meanQALYs', 'survivalCurves'):
+        np.testing.assert_array_equal(getattr(outcomes, name), getattr(serial.multiCohortOutcomes, name), err_msg=name)
+
+
+def test_parallel_multi_cohort_is_identical_to_serial_multi_cohort():
+    serial = get_multi_cohort(engine=CohortEngines.VECTORIZED)
+    serial.simulate(sim_length=25, n_workers=1)
+    parallel = get_multi_cohort(engine=CohortEngines.VECTORIZED)
+    parallel.simulate(sim_length=25, n_workers=2)
+
+    np.testing.assert_array_equal(parallel.multiCohortOutcomes.meanCosts, serial.multiCohortOutcomes.meanCosts)
+    np.testing.assert_array_equal(parallel.multiCohortOutcomes.meanQALYs, serial.multiCohortOutcomes.meanQALYs)
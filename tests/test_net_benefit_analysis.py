@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+import NetBenefitAnalysis as NetBenefit
+
+
+@pytest.mark.parametrize('max_chunk_size', [2**22, 1000])
+def test_net_benefit_curves_match_a_loop_over_wtps(monkeypatch, max_chunk_size):
+    # a small chunk size calculates the curves over several chunks of wtp values
+    monkeypatch.setattr(NetBenefit, '_MAX_CHUNK_SIZE', max_chunk_size)
+    rng = np.random.RandomState(seed=1)
+    n_cohorts = 200
+    costs = np.array([10000, 15000, 22000])[:, None] + rng.normal(scale=2000, size=(3, n_cohorts))
+    qalys = np.array([6.0, 6.2, 6.3])[:, None] + rng.normal(scale=0.1, size=(3, n_cohorts))
+    wtps = np.linspace(0, 100000, 11)
+    alpha = 0.05
+
+    curves = NetBenefit.NetBenefitCurves(costs=costs, qalys=qalys, wtps=wtps, alpha=alpha)
+
+    for j, wtp in enumerate(wtps):
+        # net benefits indexed by (strategy, cohort)
+        nmbs = qalys * wtp - costs
+        best = nmbs.argmax(axis=0)
+        incremental_nmbs = nmbs - nmbs[0]
+        for i in range(3):
+            assert curves.expectedNMBs[i, j] == pytest.approx(nmbs[i].mean())
+            assert curves.ceacs[i, j] == pytest.approx(np.mean(best == i))
+            assert curves.expectedLosses[i, j] == pytest.approx(np.mean(nmbs.max(axis=0) - nmbs[i]))
+            assert curves.incrementalNMBs[i, j] == pytest.approx(incremental_nmbs[i].mean(), abs=1e-6)
+            np.testing.assert_allclose(
+                curves.incrementalNMBIntervals[:, i, j],
+                np.percentile(incremental_nmbs[i], [100 * alpha / 2, 100 * (1 - alpha / 2)]), atol=1e-6)
+        assert curves.optimalStrategies[j] == nmbs.mean(axis=1).argmax()
+        assert curves.evpi[j] == pytest.approx(nmbs.max(axis=0).mean() - nmbs.mean(axis=1).max())
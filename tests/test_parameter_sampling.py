@@ -0,0 +1,32 @@
+import numpy as np
+
+import InputData as Data
+from ParameterClasses import Races, Therapies
+from ProbilisticParamClasses import ParameterGenerator
+
+ALIVE_STATES = slice(0, 4)  # WELL, LOCAL, REGIONAL and DISTANT
+
+
+def get_mean_sampled_utilities(race):
+    generator = ParameterGenerator(therapy=Therapies.NO, race=race)
+    probs, costs, utilities = generator.get_new_parameter_arrays(n=20000, rng=np.random.RandomState(seed=1))
+    return utilities[:, ALIVE_STATES].mean(axis=0)
+
+
+def test_utilities_are_sampled_around_the_table_of_each_race():
+    # utilities of every race are drawn from the same distribution scaled by the utilities of the race,
+    # so the mean sampled utility relative to the table of the race is the same for all races
+    # (before, every race was sampled around the table of non-Hispanic Whites: for example, the mean
+    # sampled utility of WELL was the same for Hispanics as for Whites although their tables differ)
+    ratios = {race: get_mean_sampled_utilities(race) / Data.ANNUAL_STATE_UTILITIES[race.value, ALIVE_STATES]
+              for race in Races}
+    for race in Races:
+        np.testing.assert_allclose(ratios[race], ratios[Races.White], rtol=0.01)
+
+
+def test_races_with_different_tables_have_different_sampled_utilities():
+    white = get_mean_sampled_utilities(Races.White)
+    hispanic = get_mean_sampled_utilities(Races.Hispanic)
+
+    # WELL utility is 0.676 for Hispanics and 0.731 for Whites
+    np.testing.assert_allclose(hispanic[0] / white[0], 0.676 / 0.731, rtol=0.01)
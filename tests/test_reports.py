@@ -0,0 +1,32 @@
+import csv
+import sys
+
+import numpy as np
+
+import MultiCohortClasses as Cls
+import MultiCohortSupport as Support
+from MarkovModelClasses import CohortEngines
+from ParameterClasses import Races, Therapies
+
+
+def test_table_only_report_does_not_load_econ_eval(tmp_path):
+    multi_cohorts = [Cls.MultiCohort(ids=range(20), pop_size=100, therapy=therapy, race=Races.White,
+                                     engine=CohortEngines.ANALYTIC)
+                     for therapy in (Therapies.NO, Therapies.BI)]
+    Cls.simulate_multi_cohorts(multi_cohorts=multi_cohorts, sim_length=25)
+
+    file_name = str(tmp_path / 'CETable.csv')
+    Support.report_CEA_CBA(multi_cohort_outcomes_no=multi_cohorts[0].multiCohortOutcomes,
+                           multi_cohort_outcomes_bi=multi_cohorts[1].multiCohortOutcomes,
+                           file_name=file_name, if_plot=False, wtps=[0, 50000],
+                           nmb_file_name=str(tmp_path / 'NMBTable.csv'))
+
+    assert 'SimPy.EconEval' not in sys.modules
+    with open(file_name) as file:
+        rows = list(csv.reader(file))
+    assert [row[0] for row in rows] == ['Strategy', 'No Screening', 'Biennial Screening']
+    # the ICER is the ratio of the expected increases in cost and QALY
+    outcomes_no, outcomes_bi = (multi_cohort.multiCohortOutcomes for multi_cohort in multi_cohorts)
+    icer = ((np.mean(outcomes_bi.meanCosts) - np.mean(outcomes_no.meanCosts))
+            / (np.mean(outcomes_bi.meanQALYs) - np.mean(outcomes_no.meanQALYs)))
+    assert rows[2][5] == '{:,.2f}'.format(icer)
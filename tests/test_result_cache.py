@@ -0,0 +1,16 @@
+import os
+
+import InputData as Data
+import ResultCache
+
+
+def test_entry_evicted_after_it_is_read_is_still_returned(tmp_path, monkeypatch):
+    monkeypatch.setattr(Data, 'RESULT_CACHE_DIR', str(tmp_path))
+    ResultCache.store(key='key', multi_cohort_outcomes=[1, 2, 3])
+
+    # another process removes the entry between reading it and marking it as recently used
+    def utime(file_name):
+        raise FileNotFoundError(file_name)
+    monkeypatch.setattr(os, 'utime', utime)
+
+    assert ResultCache.load(key='key') == [1, 2, 3]
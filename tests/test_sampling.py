@@ -0,0 +1,24 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from ParameterClasses import Races, Therapies
+from ProbilisticParamClasses import ParameterGenerator, SamplingMethods
+
+
+def test_sobol_design_of_a_power_of_two_points_is_balanced():
+    generator = ParameterGenerator(therapy=Therapies.NO, race=Races.White)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        param_sets = generator.get_new_parameter_sets(n=256, rng=np.random.RandomState(seed=1),
+                                                      sampling=SamplingMethods.SOBOL)
+    assert len(param_sets) == 256
+
+
+def test_sobol_design_of_other_numbers_of_points_warns():
+    generator = ParameterGenerator(therapy=Therapies.NO, race=Races.White)
+    with pytest.warns(UserWarning, match='power of two'):
+        param_sets = generator.get_new_parameter_sets(n=200, rng=np.random.RandomState(seed=1),
+                                                      sampling=SamplingMethods.SOBOL)
+    assert len(param_sets) == 200
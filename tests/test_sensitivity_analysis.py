@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import SensitivityAnalysis as SA
+from MarkovModelClasses import CohortEngines
+from ParameterClasses import Races
+from SensitivityAnalysis import InputTypes, TornadoOutcomes
+
+
+@pytest.fixture(scope='module')
+def table():
+    tables = SA.run_one_way_analysis(races=[Races.White], sim_length=25, engine=CohortEngines.ANALYTIC,
+                                     n_workers=1)
+    return tables[Races.White]
+
+
+def get_input_index(table, input_type):
+    return next(i for i, sensitivity_input in enumerate(table.inputs) if sensitivity_input.inputType == input_type)
+
+
+def test_low_and_high_outcomes_follow_the_screening_cost(table):
+    i = get_input_index(table, InputTypes.SCREENING_COST)
+    cost = TornadoOutcomes.INCREMENTAL_COST.value
+    qaly = TornadoOutcomes.INCREMENTAL_QALY.value
+
+    # the incremental cost increases with the screening cost, and the incremental QALY does not change
+    assert table.lowOutcomes[i, cost] < table.baseOutcomes[cost] < table.highOutcomes[i, cost]
+    assert table.lowOutcomes[i, qaly] == pytest.approx(table.baseOutcomes[qaly])
+    assert table.highOutcomes[i, qaly] == pytest.approx(table.baseOutcomes[qaly])
+    # the incremental cost is linear in the screening cost (which is varied symmetrically)
+    assert (table.highOutcomes[i, cost] - table.baseOutcomes[cost]
+            == pytest.approx(table.baseOutcomes[cost] - table.lowOutcomes[i, cost]))
+
+
+def test_lower_utility_of_local_cancer_increases_the_icer(table):
+    # screening finds more cancers, so it gains less when having local cancer is worse
+    i = next(i for i, sensitivity_input in enumerate(table.inputs)
+             if sensitivity_input.inputType == InputTypes.STATE_UTILITY and sensitivity_input.state.name == 'LOCAL')
+    icer = TornadoOutcomes.ICER.value
+
+    assert table.lowOutcomes[i, icer] > table.baseOutcomes[icer] > table.highOutcomes[i, icer]
+
+
+def test_inputs_are_sorted_by_swing(table):
+    for outcome in TornadoOutcomes:
+        swings = np.abs(table.highOutcomes[:, outcome.value] - table.lowOutcomes[:, outcome.value])
+        sorted_swings = swings[table.get_sorted_inputs(outcome=outcome)]
+        finite = sorted_swings[np.isfinite(sorted_swings)]
+        assert np.all(np.diff(finite) <= 0)
+        # inputs with undefined swings go last
+        assert np.all(np.isfinite(sorted_swings[:len(finite)]))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import MultiCohortClasses as Cls
+import ValueOfInformation as VOI
+from MarkovModelClasses import CohortEngines
+from ParameterClasses import Races, Therapies
+
+N_COHORTS = 400
+WTPS = [10000, 50000, 100000]
+
+
+@pytest.fixture(scope='module')
+def multi_cohorts():
+    multi_cohorts = [Cls.MultiCohort(ids=range(N_COHORTS), pop_size=100, therapy=therapy, race=Races.White,
+                                     engine=CohortEngines.ANALYTIC)
+                     for therapy in (Therapies.NO, Therapies.BI)]
+    Cls.simulate_multi_cohorts(multi_cohorts=multi_cohorts, sim_length=25)
+    return multi_cohorts
+
+
+def test_evppi_of_all_parameters_is_evpi(multi_cohorts):
+    evpi = VOI.get_evpi(multi_cohorts=multi_cohorts, wtps=WTPS)
+    evppi = VOI.get_evppi(multi_cohorts=multi_cohorts, wtps=WTPS)
+
+    # outcomes of the analytic engine are a function of the parameters only
+    np.testing.assert_allclose(evppi['All parameters'], evpi, rtol=0.05, atol=1)
+
+
+def test_evppi_is_between_0_and_evpi(multi_cohorts):
+    evpi = VOI.get_evpi(multi_cohorts=multi_cohorts, wtps=WTPS)
+    evppi = VOI.get_evppi(multi_cohorts=multi_cohorts, wtps=WTPS)
+
+    for name, values in evppi.items():
+        assert np.all(values >= -1e-9), name
+        assert np.all(values <= evpi * 1.05 + 1), name
+
+
+def test_regression_recovers_a_polynomial():
+    rng = np.random.RandomState(seed=1)
+    x = rng.normal(size=(500, 2))
+    y = 1 + x[:, 0] - 2 * x[:, 1] ** 2
+
+    fitted, = VOI._get_regression_fitted_values(x=x, ys=[y], max_degree=2)
+    np.testing.assert_allclose(fitted, y, atol=1e-9)